@@ -1,23 +1,72 @@
+import argparse
+import bz2
+import hashlib
+import lzma
 import os
+import re
+import shutil
+import signal
+import sqlite3
+import struct
+import tarfile
+import sys
+import tempfile
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from queue import Queue
-from zipfile import ZipFile, ZIP_STORED
-from PIL import Image
+import time
+import zlib
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from queue import Queue, Empty
+import zipfile
+from zipfile import ZipFile, ZipInfo, ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA, BadZipFile
+from io import BytesIO
+from PIL import Image, ImageChops
 from natsort import natsorted
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from tkinter import ttk
 import json
 
+# tkinter 只在启动图形界面时导入，命令行模式可以在没有显示环境的服务器上运行
+tk = filedialog = messagebox = ttk = None
+
+def load_tkinter():
+    global tk, filedialog, messagebox, ttk
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+
 class Config:
     """配置管理类"""
     DEFAULT_CONFIG = {
         'max_workers': min(os.cpu_count() or 4, 8),
+        'prefetch_mb': 64,  # 每个处理中的章节最多预读的页面数据（MB），0 表示不预读
+        'memory_budget_mb': 0,  # 同时处理的章节估算内存峰值之和的上限（MB），0 表示只按并行数限制
+        'executor_backend': 'thread',  # thread: 线程池；process: 进程池（多核下扩展性更好）
         'optimize_pdf': False,
         'image_quality': 100,
+        'pdf_max_width': 0,  # PDF 页面的最大像素宽度，超过时缩小；0 表示不限制
+        'pdf_max_height': 0,  # PDF 页面的最大像素高度，例如阅读器屏幕高度 1600；0 表示不限制
+        'pdf_grayscale_detection': True,  # 检测灰度/黑白页面，分别以 8 位灰度和 1 位黑白写入 PDF
+        'pdf_grayscale_tolerance': 12,  # 通道差异不超过该值（0-255）的像素视为灰色
+        'pdf_deduplicate_pages': True,  # 内容相同的页面（如汉化组说明页）在 PDF 中只嵌入一次
+        'pdf_near_duplicates': 'off',  # 近似重复页（感知哈希）：off 不检测 / report 只记录 / skip 不写入 PDF
+        'pdf_near_duplicate_distance': 6,  # 感知哈希（128 位）差异不超过该位数时视为近似重复
+        'pdf_volume_size': 0,  # 每 N 个章节 PDF 合并为一个带书签的合订本，0 表示不生成；填很大的数即整部漫画合为一个文件
         'generate_pdf': True,
         'merge_to_long_image': False,
+        'long_image_format': 'png',  # png / webp / webp_lossless / jpeg
+        'long_image_compress_level': 6,  # PNG 压缩级别 0-9，级别越高越慢
+        'long_image_quality': 90,  # 有损 WebP / JPEG 的质量
+        'long_image_max_height': 0,  # 单个长图文件的最大高度，超过后自动分段；0 表示只受格式本身限制
+        'archive_compression': 'stored',  # 输出 ZIP 的压缩方式：stored / deflated / bzip2 / lzma
+        'archive_compress_level': 6,  # 压缩级别 0-9（bzip2 为 1-9）
+        'archive_workers': min(os.cpu_count() or 4, 8),  # 并行压缩 ZIP 条目的线程数
+        'manifest_content_hash': False,  # 构建清单是否记录源图片内容哈希（更可靠，但每次运行需读取全部图片）
+        'use_library_index': True,  # 缓存输入目录的扫描结果，目录修改时间未变化时不再重新扫描
+        'trace_stages': False,  # 记录各阶段耗时，处理结束后输出汇总表并在输出目录保存 Chrome 跟踪文件
+        'watch_settle_seconds': 10,  # 监视模式：漫画最后一次变化后静置多少秒才开始处理
+        'watch_poll_interval': 5,  # 监视模式：未安装 watchdog 时轮询输入目录的间隔（秒）
+        'watch_max_pending': 100,  # 监视模式：最多逐部记录的待处理漫画数，超过后改为整体处理一遍输入目录
         'auto_scroll': True,
         'last_input_folder': '',
         'last_output_folder': ''
@@ -26,17 +75,29 @@ class Config:
     def __init__(self, config_file="config.json"):
         self.config_file = config_file
         self.config = self.load_config()
+
+    @classmethod
+    def from_values(cls, values):
+        """根据已有的配置值创建不读写配置文件的实例（供子进程使用）"""
+        config = cls.__new__(cls)
+        config.config_file = None
+        config.config = dict(values)
+        return config
     
     def load_config(self):
+        config = self.DEFAULT_CONFIG.copy()
         try:
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    # 旧版本的配置文件缺少新增选项，以默认值补齐
+                    config.update(json.load(f))
         except Exception as e:
             print(f"加载配置文件失败：{e}")
-        return self.DEFAULT_CONFIG.copy()
+        return config
     
     def save_config(self):
+        if self.config_file is None:
+            return
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, indent=4, ensure_ascii=False)
@@ -51,16 +112,43 @@ class Config:
         self.save_config()
 
 class Logger:
-    """日志管理类"""
+    """日志管理类
+
+    工作线程只把日志和进度事件放入线程安全的队列，由 GUI 主循环定时批量取出并更新控件；
+    日志控件只保留最近 MAX_LINES 行。
+    """
+    MAX_LINES = 5000
+
     def __init__(self, text_widget, auto_scroll_var):
         self.text_widget = text_widget
         self.auto_scroll_var = auto_scroll_var
+        self.events = Queue()
+        self.text_widget.tag_configure("emoji", font=("Segoe UI Emoji", 10))
     
+    # 可在任意线程调用
     def log(self, message):
-        self.text_widget.insert(tk.END, message)
-        self.text_widget.update_idletasks()
-        self.text_widget.tag_configure("emoji", font=("Segoe UI Emoji", 10))
-        self.text_widget.tag_add("emoji", "1.0", tk.END)
+        self.events.put(('log', message))
+
+    # 投递其他事件（进度、处理结束等），可在任意线程调用
+    def post(self, kind, *args):
+        self.events.put((kind, *args))
+
+    # 取出当前队列中的事件，最多 limit 个
+    def take_events(self, limit):
+        events = []
+        try:
+            while len(events) < limit:
+                events.append(self.events.get_nowait())
+        except Empty:
+            pass
+        return events
+
+    # 将一批日志一次性写入控件，超出上限的旧日志从头部删除（只能在主线程调用）
+    def write(self, text):
+        self.text_widget.insert(tk.END, text, "emoji")
+        overflow = int(self.text_widget.index('end-1c').split('.')[0]) - self.MAX_LINES
+        if overflow > 0:
+            self.text_widget.delete('1.0', f'{overflow + 1}.0')
         if self.auto_scroll_var.get():
             self.text_widget.yview_moveto(1.0)
     
@@ -80,17 +168,1342 @@ class Logger:
         except Exception as e:
             messagebox.showerror("错误", f"导出日志失败：{str(e)}")
 
+class BufferedLogger:
+    """缓存日志的记录器，子进程处理完成后将日志一次性返回主进程"""
+    def __init__(self):
+        self.messages = []
+
+    def log(self, message):
+        self.messages.append(message)
+
+    def getvalue(self):
+        return ''.join(self.messages)
+
+class JsonLinesLogger:
+    """命令行模式的记录器，日志与进度以每行一个 JSON 对象的形式输出到标准输出"""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps({'event': event, **fields}, ensure_ascii=False)
+        with self.lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    def log(self, message):
+        message = message.rstrip('\n')
+        if message:
+            self.emit('log', message=message)
+
+    def progress(self, completed_tasks, total_tasks):
+        self.emit('progress', completed=completed_tasks, total=total_tasks)
+
+class TraceSpan:
+    """一个阶段的计时区间，可通过 set() 补充读入/写出字节数等信息"""
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.ts = time.time_ns() // 1000
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.events.append({
+            'name': self.name,
+            'ph': 'X',
+            'ts': self.ts,
+            'dur': int((time.perf_counter() - self.start) * 1_000_000),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': self.args,
+        })
+        return False
+
+class NullSpan:
+    """未启用计时时使用的空区间"""
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Tracer:
+    """分阶段计时：每个章节的每个阶段记录一个区间（含进程/线程号与读写字节数），
+    可导出为 Chrome / Perfetto 跟踪文件，也可汇总为表格；未启用时 span() 只返回共享的空区间
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return TraceSpan(self, name, args)
+
+    # 取出已记录的区间（子进程将其随处理结果返回主进程）
+    def take_events(self):
+        events, self.events = self.events, []
+        return events
+
+    def extend(self, events):
+        self.events.extend(events)
+
+    def save_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+
+    # 按阶段汇总：次数、总耗时（各线程/进程之和）、平均耗时、读入与写出的数据量
+    def summary(self):
+        stages = {}
+        for event in self.events:
+            stage = stages.setdefault(event['name'], [0, 0, 0, 0])
+            stage[0] += 1
+            stage[1] += event['dur']
+            stage[2] += event['args'].get('bytes_in', 0)
+            stage[3] += event['args'].get('bytes_out', 0)
+        # 中文表头每个字占两列宽度，相应减少填充
+        lines = [f"{'阶段':<12}{'次数':>6}{'总耗时(s)':>9}{'平均(ms)':>8}{'读入(MB)':>8}{'写出(MB)':>8}"]
+        for name, (count, total, bytes_in, bytes_out) in sorted(stages.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<14}{count:>8}{total / 1e6:>12.2f}{total / count / 1e3:>10.1f}"
+                         f"{bytes_in / 1048576:>10.1f}{bytes_out / 1048576:>10.1f}")
+        return '\n'.join(lines) + '\n'
+
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'webp')
+# 按长度从长到短排列，去掉扩展名时优先匹配 .tar.gz
+ARCHIVE_EXTENSIONS = ('.tar.gz', '.cbz', '.zip', '.cbt', '.tar', '.tgz')
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def is_archive_file(path):
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+class ArchivePage:
+    """压缩包中的一页图片，以文件对象的形式按需读取，无需解压到磁盘"""
+    def __init__(self, archive, name, size, stamp):
+        self.archive = archive
+        self.name = name
+        self.size = size
+        # ZIP 条目为 CRC32，TAR 条目为修改时间，用于构建清单比对
+        self.stamp = stamp
+
+    def open(self):
+        return self.archive.open_member(self.name)
+
+    def __str__(self):
+        return f"{self.archive.path}:{self.name}"
+
+class ChapterArchive:
+    """以 CBZ/ZIP/CBT/TAR 压缩包形式存放的章节，页面按自然顺序排列"""
+    def __init__(self, path):
+        self.path = path
+        self.zip = None
+        self.tar = None
+        if zipfile.is_zipfile(path):
+            self.zip = ZipFile(path)
+            members = [
+                (info.filename, info.file_size, info.CRC)
+                for info in self.zip.infolist() if not info.is_dir()
+            ]
+        else:
+            self.tar = tarfile.open(path)
+            members = [(info.name, info.size, int(info.mtime)) for info in self.tar.getmembers() if info.isfile()]
+        self.pages = natsorted(
+            (ArchivePage(self, name, size, stamp) for name, size, stamp in members
+             # 跳过 macOS 打包时附带的元数据
+             if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('__MACOSX/')),
+            key=lambda page: page.name
+        )
+
+    def open_member(self, name):
+        if self.zip is not None:
+            return self.zip.open(name)
+        return self.tar.extractfile(name)
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+        if self.tar is not None:
+            self.tar.close()
+
+    def __enter__(self):
+        return self.pages
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# 以二进制文件对象打开一页图片，页面可以是磁盘上的路径，也可以是压缩包中的条目
+def open_page(page):
+    if isinstance(page, ArchivePage):
+        return page.open()
+    return open(page, 'rb')
+
+# 解析 PNG 文件头与数据块，若能直接作为 PDF 的 Flate 图像流嵌入则返回所需参数，否则返回 None
+def parse_png_for_pdf(data):
+    if data[:8] != PNG_SIGNATURE:
+        return None
+
+    header = None
+    idat_chunks = []
+    pos = 8
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk_data = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk_data)
+        elif chunk_type == b'IDAT':
+            idat_chunks.append(chunk_data)
+        elif chunk_type == b'tRNS':
+            # 带透明色的 PNG 需要合成背景，不能直接嵌入
+            return None
+        elif chunk_type == b'IEND':
+            break
+
+    if header is None or not idat_chunks:
+        return None
+    width, height, bit_depth, color_type, _, _, interlace = header
+    # 仅支持 8 位灰度/RGB、1 位灰度且非隔行扫描的 PNG，其余（调色板、透明通道等）交给 Pillow 处理
+    if interlace or color_type not in (0, 2) or bit_depth not in (1, 8) or (bit_depth == 1 and color_type != 0):
+        return None
+
+    colors = 1 if color_type == 0 else 3
+    color_space = 'DeviceGray' if colors == 1 else 'DeviceRGB'
+    decode_parms = f"<< /Predictor 15 /Colors {colors} /BitsPerComponent {bit_depth} /Columns {width} >>"
+    return width, height, color_space, decode_parms, b''.join(idat_chunks), bit_depth
+
+class PdfWriter:
+    """逐页写出的 PDF 写入器
+
+    每页的图像流写入磁盘后即被释放，内存中只保留对象偏移量，
+    因此生成超长章节时内存占用与页数无关。
+    内容先写入同目录下的临时文件，关闭时再原子替换为目标文件，中途退出不会留下不完整的 PDF。
+    deduplicate 为 True 时，内容相同的图像只写入一次，各页共享同一个图像 XObject。
+    """
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, path, deduplicate=True):
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.file = open(self.temp_path, 'wb')
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 3
+        self.deduplicate = deduplicate
+        # 已写入的图像：图像流与参数的摘要 → (对象号, 宽, 高, 字节数)；源图片摘要 → 同一图像
+        self.images = {}
+        self.source_images = {}
+        self.duplicate_pages = 0
+        self.duplicate_bytes = 0
+        # 书签：(标题, 起始页序号)
+        self.outlines = []
+        self.file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def new_object_id(self):
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def write_object(self, obj_id, body):
+        self.offsets[obj_id] = self.file.tell()
+        self.file.write(f"{obj_id} 0 obj\n{body}\nendobj\n".encode('latin-1'))
+
+    def write_stream(self, obj_id, entries, data):
+        self.offsets[obj_id] = self.file.tell()
+        self.file.write(f"{obj_id} 0 obj\n<< {entries} /Length {len(data)} >>\nstream\n".encode('latin-1'))
+        self.file.write(data)
+        self.file.write(b"\nendstream\nendobj\n")
+
+    # 写入一页：图像 XObject、内容流和页面对象，页面尺寸按 72 DPI 与像素一一对应。
+    # source_key 为源图片内容的摘要，之后相同的源图片可以用 add_duplicate_page 直接引用，无需再次编码
+    def add_image_page(self, data, width, height, color_space, filter_name, decode_parms=None, bits=8, source_key=None):
+        entries = (f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                   f"/ColorSpace /{color_space} /BitsPerComponent {bits} /Filter /{filter_name}")
+        if decode_parms:
+            entries += f" /DecodeParms {decode_parms}"
+        image = None
+        if self.deduplicate:
+            image_key = hashlib.blake2b(data, digest_size=16, person=b'pdf-image')
+            image_key.update(entries.encode('latin-1'))
+            image_key = image_key.digest()
+            image = self.images.get(image_key)
+        if image is None:
+            image = (self.new_object_id(), width, height, len(data))
+            self.write_stream(image[0], entries, data)
+            if self.deduplicate:
+                self.images[image_key] = image
+        else:
+            self.duplicate_pages += 1
+            self.duplicate_bytes += image[3]
+        if self.deduplicate and source_key is not None:
+            self.source_images[source_key] = image
+        self.write_page(*image[:3])
+
+    # 源图片与已写入的某页相同时直接引用其图像并返回 True，否则返回 False
+    def add_duplicate_page(self, source_key):
+        image = self.source_images.get(source_key)
+        if image is None:
+            return False
+        self.duplicate_pages += 1
+        self.duplicate_bytes += image[3]
+        self.write_page(*image[:3])
+        return True
+
+    def write_page(self, image_id, width, height):
+        content_id = self.new_object_id()
+        page_id = self.new_object_id()
+        self.write_stream(content_id, "", f"q {width} 0 0 {height} 0 0 cm /Im0 Do Q".encode('latin-1'))
+        self.write_object(page_id, (
+            f"<< /Type /Page /Parent {self.PAGES_ID} 0 R /MediaBox [0 0 {width} {height}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ))
+        self.page_ids.append(page_id)
+
+    # 在下一页处添加一个书签（如章节标题）
+    def add_outline(self, title):
+        self.outlines.append((title, len(self.page_ids)))
+
+    # 写入书签树，返回书签根对象号；没有指向有效页面的书签时返回 None
+    def write_outlines(self):
+        outlines = [(title, start) for title, start in self.outlines if start < len(self.page_ids)]
+        if not outlines:
+            return None
+        outlines_id = self.new_object_id()
+        item_ids = [self.new_object_id() for _ in outlines]
+        for index, (title, start) in enumerate(outlines):
+            # 标题以 UTF-16BE 十六进制字符串写入，支持中文
+            entries = [f"/Title <FEFF{title.encode('utf-16-be').hex().upper()}>", f"/Parent {outlines_id} 0 R",
+                       f"/Dest [{self.page_ids[start]} 0 R /Fit]"]
+            if index > 0:
+                entries.append(f"/Prev {item_ids[index - 1]} 0 R")
+            if index < len(outlines) - 1:
+                entries.append(f"/Next {item_ids[index + 1]} 0 R")
+            self.write_object(item_ids[index], f"<< {' '.join(entries)} >>")
+        self.write_object(outlines_id, f"<< /Type /Outlines /First {item_ids[0]} 0 R /Last {item_ids[-1]} 0 R "
+                                       f"/Count {len(outlines)} >>")
+        return outlines_id
+
+    # 写入页面树、书签、目录、交叉引用表并关闭文件
+    def close(self):
+        kids = ' '.join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self.write_object(self.PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>")
+        outlines_id = self.write_outlines()
+        if outlines_id is None:
+            self.write_object(self.CATALOG_ID, f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>")
+        else:
+            self.write_object(self.CATALOG_ID, f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R "
+                                               f"/Outlines {outlines_id} 0 R /PageMode /UseOutlines >>")
+
+        xref_offset = self.file.tell()
+        xref = [f"xref\n0 {self.next_id}\n", "0000000000 65535 f \n"]
+        xref.extend(f"{self.offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, self.next_id))
+        xref.append(f"trailer\n<< /Size {self.next_id} /Root {self.CATALOG_ID} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self.file.write(''.join(xref).encode('latin-1'))
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    # 生成失败时关闭并删除不完整的临时文件
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+class PdfImageReader:
+    """读取 PdfWriter 生成的 PDF（每页一个图像 XObject），按页返回图像流的原始字节与参数，不解码
+
+    只按需读取交叉引用表与各对象，内存占用与文件大小无关。其他程序生成的 PDF 在安装了 pikepdf 时
+    由 pikepdf 读取，同样只复制图像流；页面不是单个图像时抛出 ValueError。
+    """
+    OBJECT_HEADER_SIZE = 4096
+    IMAGE_PATTERN = re.compile(
+        rb"/Subtype /Image /Width (\d+) /Height (\d+) /ColorSpace /(\w+) /BitsPerComponent (\d+) "
+        rb"/Filter /(\w+)(?: /DecodeParms (<<[^<>]*>>))? /Length (\d+) >>\nstream\n")
+
+    def __init__(self, path):
+        self.path = path
+
+    # 依次返回各页的 (数据, 宽, 高, 颜色空间, 滤镜, 解码参数, 位深)，与 PdfWriter.add_image_page 的参数一致
+    def pages(self):
+        with open(self.path, 'rb') as f:
+            try:
+                offsets, root_id = self.read_xref(f)
+            except ValueError:
+                offsets = None
+            if offsets is None:
+                yield from self.pages_with_pikepdf()
+                return
+            catalog = self.read_object(f, offsets, root_id)
+            pages_id = int(re.search(rb"/Pages (\d+) 0 R", catalog).group(1))
+            kids = re.search(rb"/Kids \[([^\]]*)\]", self.read_object(f, offsets, pages_id))
+            if not kids:
+                raise ValueError(f"无法读取 PDF 的页面列表：{self.path}")
+            for page_id in re.findall(rb"(\d+) 0 R", kids.group(1)):
+                page = self.read_object(f, offsets, int(page_id))
+                image_id = int(re.search(rb"/XObject << /Im0 (\d+) 0 R >>", page).group(1))
+                yield self.read_image(f, offsets, image_id)
+
+    def read_xref(self, f):
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 1024))
+        tail = f.read()
+        match = re.search(rb"trailer\n<< /Size (\d+) /Root (\d+) 0 R >>\nstartxref\n(\d+)\n%%EOF\s*$", tail)
+        if not match:
+            raise ValueError(f"不是本程序生成的 PDF：{self.path}")
+        count, root_id, xref_offset = (int(value) for value in match.groups())
+        f.seek(xref_offset)
+        if f.readline() != b"xref\n" or f.readline() != f"0 {count}\n".encode('latin-1'):
+            raise ValueError(f"不是本程序生成的 PDF：{self.path}")
+        table = f.read(20 * count)
+        offsets = {obj_id: int(table[obj_id * 20:obj_id * 20 + 10]) for obj_id in range(1, count)}
+        return offsets, root_id
+
+    # 读取对象的字典部分：逐块读到 endobj 或流数据开始处为止，页数很多时 /Pages 的 /Kids 数组也能完整读出，
+    # 图像对象不读入流数据
+    def read_object(self, f, offsets, obj_id):
+        f.seek(offsets[obj_id])
+        header = b""
+        while True:
+            chunk = f.read(self.OBJECT_HEADER_SIZE)
+            searched = max(0, len(header) - len(b">>\nstream\n"))
+            header += chunk
+            if not chunk or header.find(b"endobj", searched) >= 0 or header.find(b">>\nstream\n", searched) >= 0:
+                break
+        prefix = f"{obj_id} 0 obj\n".encode('latin-1')
+        if not header.startswith(prefix):
+            raise ValueError(f"PDF 对象 {obj_id} 的位置不正确：{self.path}")
+        return header[len(prefix):]
+
+    def read_image(self, f, offsets, image_id):
+        header = self.read_object(f, offsets, image_id)
+        match = self.IMAGE_PATTERN.search(header)
+        if not match:
+            raise ValueError(f"无法识别 PDF 中的图像对象 {image_id}：{self.path}")
+        width, height, color_space, bits, filter_name, decode_parms, length = match.groups()
+        f.seek(offsets[image_id] + len(f"{image_id} 0 obj\n") + match.end())
+        data = f.read(int(length))
+        return (data, int(width), int(height), color_space.decode('latin-1'), filter_name.decode('latin-1'),
+                decode_parms.decode('latin-1') if decode_parms else None, int(bits))
+
+    def pages_with_pikepdf(self):
+        try:
+            import pikepdf
+        except ImportError:
+            raise ValueError(f"不是本程序生成的 PDF，需要安装 pikepdf 才能读取：{self.path}")
+        with pikepdf.open(self.path) as pdf:
+            for number, page in enumerate(pdf.pages, 1):
+                images = list(page.images.values())
+                if len(images) != 1:
+                    raise ValueError(f"第 {number} 页不是单个图像：{self.path}")
+                image = images[0]
+                color_space = image.get('/ColorSpace')
+                filter_name = image.get('/Filter')
+                if not isinstance(color_space, pikepdf.Name) or not isinstance(filter_name, pikepdf.Name):
+                    raise ValueError(f"第 {number} 页的图像格式无法直接复制：{self.path}")
+                decode_parms = image.get('/DecodeParms')
+                yield (image.read_raw_bytes(), int(image.Width), int(image.Height), str(color_space)[1:],
+                       str(filter_name)[1:], decode_parms.unparse(resolved=True).decode('latin-1') if decode_parms else None,
+                       int(image.get('/BitsPerComponent', 8)))
+
+class PngStreamWriter:
+    """按行流式写出的 RGB PNG 编码器
+
+    像素行经 zlib 增量压缩后分块写入 IDAT，调用方每次只需提供一张图片的像素，
+    因此生成长图时内存占用与长图总高度无关。写入临时文件，完成后原子替换为目标文件。
+    """
+    IDAT_CHUNK_SIZE = 1 << 20
+
+    def __init__(self, path, width, height, compress_level=6):
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.width = width
+        self.height = height
+        self.stride = width * 3
+        self.rows_written = 0
+        self.compressor = zlib.compressobj(compress_level)
+        self.pending = bytearray()
+        self.file = open(self.temp_path, 'wb')
+        self.file.write(PNG_SIGNATURE)
+        # 8 位 RGB，非隔行扫描
+        self.write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def write_chunk(self, chunk_type, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(chunk_type)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
+
+    # 写入若干完整的像素行（RGB 原始字节），每行前加滤波类型 0
+    def write_rows(self, raw):
+        stride = self.stride
+        rows = len(raw) // stride
+        view = memoryview(raw)
+        filtered = b''.join(b'\x00' + view[i:i + stride] for i in range(0, rows * stride, stride))
+        self.pending += self.compressor.compress(filtered)
+        self.rows_written += rows
+        if len(self.pending) >= self.IDAT_CHUNK_SIZE:
+            self.write_chunk(b'IDAT', bytes(self.pending))
+            self.pending.clear()
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"长图行数不匹配：应为 {self.height}，实际写入 {self.rows_written}")
+        self.pending += self.compressor.flush()
+        self.write_chunk(b'IDAT', bytes(self.pending))
+        self.write_chunk(b'IEND', b'')
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    # 生成失败时关闭并删除不完整的临时文件
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+class LongImageWriter:
+    """长图写入器，按所选格式编码，超过最大高度时自动拆分为多个分段文件
+
+    不分段的 PNG 通过 PngStreamWriter 按行流式编码；其余情况每个分段使用一张画布，
+    画布填满后交给编码线程池，与后续分段的填充并行进行。
+    分段先编码到临时文件，全部成功后才替换为正式文件名。
+    """
+    FORMAT_EXTENSIONS = {'png': 'png', 'webp': 'webp', 'webp_lossless': 'webp', 'jpeg': 'jpg'}
+    # WebP 单边最大 16383 像素，JPEG 最大 65535 像素
+    FORMAT_MAX_HEIGHT = {'webp': 16383, 'webp_lossless': 16383, 'jpeg': 65535}
+
+    def __init__(self, output_base, width, total_height, image_format='png', max_height=0,
+                 compress_level=6, quality=90, encode_workers=2):
+        if image_format not in self.FORMAT_EXTENSIONS:
+            image_format = 'png'
+        self.image_format = image_format
+        self.width = width
+        self.compress_level = compress_level
+        self.quality = quality
+        self.encode_workers = max(1, encode_workers)
+
+        self.segment_heights = self.plan_segments(image_format, total_height, max_height)
+
+        extension = self.FORMAT_EXTENSIONS[image_format]
+        if len(self.segment_heights) == 1:
+            self.paths = [f"{output_base}.{extension}"]
+        else:
+            self.paths = [f"{output_base}_{index:03d}.{extension}" for index in range(1, len(self.segment_heights) + 1)]
+
+        self.segment_index = -1
+        self.segment = None
+        self.segment_offset = 0
+        self.stream_writer = None
+        self.executor = None
+        self.pending = []
+
+    @classmethod
+    def extension_for(cls, image_format):
+        return cls.FORMAT_EXTENSIONS.get(image_format, 'png')
+
+    # 按格式限制与最大高度拆分长图，返回各分段的高度
+    @classmethod
+    def plan_segments(cls, image_format, total_height, max_height=0):
+        segment_height = cls.FORMAT_MAX_HEIGHT.get(image_format, 0)
+        if max_height and (not segment_height or max_height < segment_height):
+            segment_height = max_height
+        if not segment_height or segment_height > total_height:
+            segment_height = total_height
+        segment_heights = [segment_height] * (total_height // segment_height)
+        if total_height % segment_height:
+            segment_heights.append(total_height % segment_height)
+        return segment_heights
+
+    # 写入若干完整的像素行（RGB 原始字节），跨越分段边界时自动切换到下一分段
+    def write_rows(self, raw):
+        stride = self.width * 3
+        view = memoryview(raw)
+        while len(view):
+            if self.segment is None and self.stream_writer is None:
+                self.start_segment()
+            segment_height = self.segment_heights[self.segment_index]
+            rows = min(len(view) // stride, segment_height - self.segment_offset)
+            chunk = view[:rows * stride]
+            if self.stream_writer is not None:
+                self.stream_writer.write_rows(chunk)
+            else:
+                self.segment.paste(Image.frombytes('RGB', (self.width, rows), bytes(chunk)), (0, self.segment_offset))
+            self.segment_offset += rows
+            view = view[rows * stride:]
+            if self.segment_offset == segment_height:
+                self.finish_segment()
+
+    def start_segment(self):
+        self.segment_index += 1
+        self.segment_offset = 0
+        height = self.segment_heights[self.segment_index]
+        path = self.paths[self.segment_index]
+        if self.image_format == 'png' and len(self.segment_heights) == 1:
+            self.stream_writer = PngStreamWriter(path, self.width, height, compress_level=self.compress_level)
+            return
+        # 限制同时在编码中的分段数量，避免画布堆积占用过多内存
+        while len(self.pending) >= self.encode_workers:
+            self.pending.pop(0).result()
+        self.segment = Image.new('RGB', (self.width, height))
+
+    def finish_segment(self):
+        if self.stream_writer is not None:
+            self.stream_writer.close()
+            self.stream_writer = None
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.encode_workers)
+        self.pending.append(self.executor.submit(self.save_segment, self.segment, self.paths[self.segment_index]))
+        self.segment = None
+
+    def save_segment(self, segment, path):
+        path = f"{path}.tmp"
+        if self.image_format == 'png':
+            segment.save(path, format='PNG', compress_level=self.compress_level)
+        elif self.image_format == 'webp':
+            segment.save(path, format='WEBP', quality=self.quality)
+        elif self.image_format == 'webp_lossless':
+            segment.save(path, format='WEBP', lossless=True)
+        else:
+            segment.save(path, format='JPEG', quality=self.quality)
+
+    # 等待所有分段编码完成
+    def close(self):
+        if self.segment_index != len(self.segment_heights) - 1 or self.segment is not None or self.stream_writer is not None:
+            raise ValueError("长图行数与预计高度不一致")
+        try:
+            for future in self.pending:
+                future.result()
+        finally:
+            self.pending = []
+            if self.executor:
+                self.executor.shutdown()
+        # 流式 PNG 已由 PngStreamWriter 自行替换，画布分段在全部编码完成后统一替换
+        if self.executor:
+            for path in self.paths:
+                os.replace(f"{path}.tmp", path)
+
+    # 生成失败时等待编码线程结束并删除已写出的分段
+    def abort(self):
+        if self.stream_writer is not None:
+            self.stream_writer.abort()
+            self.stream_writer = None
+        if self.executor:
+            self.executor.shutdown()
+        self.segment = None
+        for path in self.paths:
+            if os.path.exists(f"{path}.tmp"):
+                os.remove(f"{path}.tmp")
+
+# 只读取图片文件头，返回 [宽, 高, 颜色模式]；无法识别时返回 [0, 0, None]
+def probe_image(page):
+    try:
+        with open_page(page) as f, Image.open(f) as img:
+            return [img.width, img.height, img.mode]
+    except Exception:
+        return [0, 0, None]
+
+class ZipLzmaCompressor:
+    """ZIP 条目使用的 LZMA 压缩器：数据前附加 LZMA 属性头，写法与 zipfile 相同，但可以指定压缩预设"""
+
+    def __init__(self, preset):
+        lzma_filter = {'id': lzma.FILTER_LZMA1, 'preset': preset}
+        # 与 zipfile.LZMACompressor 相同，借助 lzma 模块编码属性头
+        properties = lzma._encode_filter_properties(lzma_filter)
+        self.header = struct.pack('<BBH', 9, 4, len(properties)) + properties
+        self.compressor = lzma.LZMACompressor(lzma.FORMAT_RAW, filters=[lzma_filter])
+
+    def compress(self, data):
+        header, self.header = self.header, b""
+        return header + self.compressor.compress(data)
+
+    def flush(self):
+        header, self.header = self.header, b""
+        return header + self.compressor.flush()
+
+class ZipArchiveWriter:
+    """顺序写出 ZIP 压缩包：条目数据由调用方提供（已压缩好的数据，或从原压缩包原样复制的数据），
+    文件或条目超过 4GB、条目超过 65535 个时使用 ZIP64 扩展"""
+
+    COMPRESSIONS = {'stored': ZIP_STORED, 'deflated': ZIP_DEFLATED, 'bzip2': ZIP_BZIP2, 'lzma': ZIP_LZMA}
+    VERSIONS = {ZIP_STORED: 20, ZIP_DEFLATED: 20, ZIP_BZIP2: 46, ZIP_LZMA: 63}
+    LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+    CENTRAL_HEADER = struct.Struct('<4s6H3L5H2L')
+    ZIP64_END_RECORD = struct.Struct('<4sQ2H2L4Q')
+    ZIP64_LOCATOR = struct.Struct('<4sLQL')
+    END_RECORD = struct.Struct('<4s4H2LH')
+    ZIP64_LIMIT = 0xFFFFFFFF
+    COPY_CHUNK = 1 << 20
+
+    # entries 和 offset 用于追加：原有条目（ZipInfo）保留在中央目录中，新条目从原中央目录的位置开始写入
+    def __init__(self, path, entries=None, offset=0, comment=b""):
+        self.path = path
+        self.file = open(path, 'wb' if entries is None else 'r+b')
+        self.file.seek(offset)
+        self.entries = list(entries or [])
+        self.comment = comment
+
+    # 按压缩方式创建压缩器，压缩后的数据可直接作为条目数据写入
+    @staticmethod
+    def compressor(method, level):
+        if method == ZIP_DEFLATED:
+            return zlib.compressobj(level, zlib.DEFLATED, -15)
+        if method == ZIP_BZIP2:
+            return bz2.BZ2Compressor(max(level, 1))
+        return ZipLzmaCompressor(level)
+
+    # 写入一个条目：info 的 CRC、compress_size、file_size、compress_type 须已填好，data 从当前位置提供 compress_size 字节
+    def write_entry(self, info, data):
+        info.header_offset = self.file.tell()
+        # 数据长度已知，不再需要数据描述符
+        info.flag_bits &= ~0x08
+        name, flag_bits = self.encode_name(info)
+        zip64 = info.file_size >= self.ZIP64_LIMIT or info.compress_size >= self.ZIP64_LIMIT
+        extra = struct.pack('<2H2Q', 1, 16, info.file_size, info.compress_size) if zip64 else b""
+        version = max(self.VERSIONS.get(info.compress_type, 20), 45 if zip64 else 0)
+        dos_time, dos_date = self.dos_date_time(info.date_time)
+        self.file.write(self.LOCAL_HEADER.pack(
+            b'PK\x03\x04', version, flag_bits, info.compress_type, dos_time, dos_date, info.CRC,
+            self.ZIP64_LIMIT if zip64 else info.compress_size, self.ZIP64_LIMIT if zip64 else info.file_size,
+            len(name), len(extra)))
+        self.file.write(name)
+        self.file.write(extra)
+        remaining = info.compress_size
+        while remaining:
+            chunk = data.read(min(remaining, self.COPY_CHUNK))
+            if not chunk:
+                raise OSError(f"条目数据不完整：{info.filename}")
+            self.file.write(chunk)
+            remaining -= len(chunk)
+        self.entries.append(info)
+
+    # 从另一个 ZIP 文件中原样复制条目数据，不解压也不重新压缩
+    def copy_entry(self, source, info):
+        source.seek(info.header_offset)
+        header = self.LOCAL_HEADER.unpack(source.read(self.LOCAL_HEADER.size))
+        if header[0] != b'PK\x03\x04':
+            raise BadZipFile(f"条目头损坏：{info.filename}")
+        source.seek(header[-2] + header[-1], os.SEEK_CUR)
+        self.write_entry(info, source)
+
+    # 非 ASCII 文件名以 UTF-8 编码并设置对应标志位
+    def encode_name(self, info):
+        try:
+            return info.filename.encode('ascii'), info.flag_bits
+        except UnicodeEncodeError:
+            return info.filename.encode('utf-8'), info.flag_bits | 0x800
+
+    @staticmethod
+    def dos_date_time(date_time):
+        year, month, day, hour, minute, second = date_time
+        return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+    # 写入中央目录和结束记录；追加时截掉原中央目录多出的部分
+    def close(self):
+        try:
+            directory_offset = self.file.tell()
+            for info in self.entries:
+                name, flag_bits = self.encode_name(info)
+                fields = [value for value in (info.file_size, info.compress_size, info.header_offset)
+                          if value >= self.ZIP64_LIMIT]
+                extra = struct.pack(f'<2H{len(fields)}Q', 1, 8 * len(fields), *fields) if fields else b""
+                version = max(self.VERSIONS.get(info.compress_type, 20), 45 if fields else 0)
+                dos_time, dos_date = self.dos_date_time(info.date_time)
+                self.file.write(self.CENTRAL_HEADER.pack(
+                    b'PK\x01\x02', (info.create_system << 8) | version, version, flag_bits, info.compress_type,
+                    dos_time, dos_date, info.CRC, min(info.compress_size, self.ZIP64_LIMIT),
+                    min(info.file_size, self.ZIP64_LIMIT), len(name), len(extra), 0, 0, 0,
+                    info.external_attr, min(info.header_offset, self.ZIP64_LIMIT)))
+                self.file.write(name)
+                self.file.write(extra)
+            directory_size = self.file.tell() - directory_offset
+            count = len(self.entries)
+            if count >= 0xFFFF or directory_offset >= self.ZIP64_LIMIT or directory_size >= self.ZIP64_LIMIT:
+                record_offset = self.file.tell()
+                self.file.write(self.ZIP64_END_RECORD.pack(
+                    b'PK\x06\x06', self.ZIP64_END_RECORD.size - 12, 45, 45, 0, 0,
+                    count, count, directory_size, directory_offset))
+                self.file.write(self.ZIP64_LOCATOR.pack(b'PK\x06\x07', 0, record_offset, 1))
+            self.file.write(self.END_RECORD.pack(
+                b'PK\x05\x06', 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                min(directory_size, self.ZIP64_LIMIT), min(directory_offset, self.ZIP64_LIMIT), len(self.comment)))
+            self.file.write(self.comment)
+            self.file.truncate()
+        finally:
+            self.file.close()
+
+class PagePrefetcher:
+    """后台预读线程：按给定顺序提前把页面数据读入内存，已读入但尚未取走的数据量不超过字节预算
+    （至少预读一页），从网络共享或机械硬盘读取时解码不必等待 I/O
+    """
+    def __init__(self, pages, read, budget_bytes):
+        self.pages = pages
+        self.read = read
+        self.budget_bytes = budget_bytes
+        self.buffered_bytes = 0
+        self.results = {}
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        for index, page in enumerate(self.pages):
+            with self.condition:
+                while not self.stopped and self.results and self.buffered_bytes >= self.budget_bytes:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+            try:
+                result = (self.read(page), None)
+            except Exception as e:
+                result = (None, e)
+            with self.condition:
+                self.results[index] = result
+                self.buffered_bytes += len(result[0] or b'')
+                self.condition.notify_all()
+
+    # 取出第 index 页的数据（必须按顺序取），读取失败时抛出读取时的异常
+    def get(self, index):
+        with self.condition:
+            while index not in self.results:
+                self.condition.wait()
+            data, error = self.results.pop(index)
+            self.buffered_bytes -= len(data or b'')
+            self.condition.notify_all()
+        if error is not None:
+            raise error
+        return data
+
+    def close(self):
+        with self.condition:
+            self.stopped = True
+            self.results.clear()
+            self.condition.notify_all()
+        self.thread.join()
+
+class DecodedPageCache:
+    """已解码页面的 LRU 缓存：同时生成 PDF 与长图时两者共用一次解码的结果，只保留最近几页以限制内存"""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.pages = OrderedDict()
+
+    def get(self, key, decode):
+        if key in self.pages:
+            self.pages.move_to_end(key)
+            return self.pages[key]
+        image = decode()
+        self.pages[key] = image
+        while len(self.pages) > self.capacity:
+            _, evicted = self.pages.popitem(last=False)
+            evicted.close()
+        return image
+
+    def clear(self):
+        for image in self.pages.values():
+            image.close()
+        self.pages.clear()
+
+class ProcessingCancelled(Exception):
+    """处理已被用户取消"""
+
+class LibraryIndex:
+    """输入目录的扫描索引：漫画 → 章节 → 页面（大小、修改时间、尺寸、颜色模式）
+
+    使用 os.scandir 一次遍历整棵目录树，结果保存在输出文件夹中。再次运行时，
+    修改时间未变化的目录复用上次的列表，不再列目录，但仍逐个获取页面的文件属性：
+    原地覆盖图片不会改变所在目录的修改时间，只有大小和修改时间未变化的页面才复用上次读取的文件头。
+    大小和修改时间未变化的压缩包直接复用上次的记录。
+    """
+    FILE_NAME = '.comic-to-pdf-index.json'
+    VERSION = 1
+    PROBE_WORKERS = 8
+    PROBE_BATCH = 256
+
+    def __init__(self, output_folder):
+        self.path = os.path.join(output_folder, self.FILE_NAME)
+        self.base_folder = None
+        self.entries = {}
+        self.reused = 0
+        self.scanned = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.base_folder = data['base_folder']
+                self.entries = data['entries']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    # 写入临时文件后替换，避免中途退出留下损坏的索引
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'base_folder': self.base_folder, 'entries': self.entries},
+                      f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    # cancel_event 被设置时在读取文件头的批次之间抛出 ProcessingCancelled，不保存不完整的索引；
+    # rescan 中列出的漫画不复用上次的记录，整棵目录重新扫描（监视模式下已知发生变化的漫画）
+    def scan(self, base_folder, cancel_event=None, rescan=()):
+        previous = self.entries if base_folder == self.base_folder else {}
+        if rescan:
+            folders = tuple(os.path.join(base_folder, name) for name in rescan)
+            previous = {path: entry for path, entry in previous.items()
+                        if not any(path == folder or path.startswith(folder + os.sep) for folder in folders)}
+        self.base_folder = base_folder
+        self.entries = {}
+        self.reused = 0
+        self.scanned = 0
+        to_probe = []
+        self.scan_directory(base_folder, previous, to_probe, depth=0)
+
+        # 新增或变化的页面并行读取文件头
+        if to_probe:
+            with ThreadPoolExecutor(max_workers=self.PROBE_WORKERS) as executor:
+                for start in range(0, len(to_probe), self.PROBE_BATCH):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ProcessingCancelled()
+                    batch = to_probe[start:start + self.PROBE_BATCH]
+                    for (page, _), info in zip(batch, executor.map(probe_image, [source for _, source in batch])):
+                        page.extend(info)
+
+    def scan_directory(self, path, previous, to_probe, depth):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+        entry = previous.get(path)
+        if entry is not None and entry.get('type') == 'dir' and entry['mtime'] == mtime:
+            self.reused += 1
+            pages, changed = [], []
+            for page in entry['pages']:
+                try:
+                    stat = os.stat(os.path.join(path, page[0]))
+                except OSError:
+                    continue
+                if page[1] == stat.st_size and page[2] == stat.st_mtime_ns:
+                    pages.append(page)
+                else:
+                    page = [page[0], stat.st_size, stat.st_mtime_ns]
+                    pages.append(page)
+                    changed.append(page)
+            self.queue_probe(path, changed, to_probe, depth)
+            entry = dict(entry, pages=pages)
+        else:
+            self.scanned += 1
+            dirs, archives, pages = [], [], []
+            try:
+                with os.scandir(path) as it:
+                    for item in it:
+                        if item.is_dir():
+                            dirs.append(item.name)
+                        elif item.name.lower().endswith(IMAGE_EXTENSIONS) and item.is_file():
+                            stat = item.stat()
+                            pages.append([item.name, stat.st_size, stat.st_mtime_ns])
+                        elif is_archive_file(item.name) and item.is_file():
+                            archives.append(item.name)
+            except OSError:
+                return
+            pages = natsorted(pages, key=lambda page: page[0])
+            self.queue_probe(path, pages, to_probe, depth)
+            entry = {'type': 'dir', 'mtime': mtime, 'dirs': natsorted(dirs), 'archives': natsorted(archives), 'pages': pages}
+        self.entries[path] = entry
+
+        for name in entry['dirs']:
+            self.scan_directory(os.path.join(path, name), previous, to_probe, depth + 1)
+        for name in entry['archives']:
+            self.scan_archive(os.path.join(path, name), previous)
+
+    # 新增或变化的页面记录加入待读取文件头的列表；根目录下的图片不属于任何漫画，无需读取文件头
+    def queue_probe(self, path, pages, to_probe, depth):
+        if depth > 0:
+            to_probe.extend((page, os.path.join(path, page[0])) for page in pages)
+        else:
+            for page in pages:
+                page.extend([0, 0, None])
+
+    def scan_archive(self, path, previous):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        entry = previous.get(path)
+        if (entry is not None and entry.get('type') == 'archive'
+                and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size):
+            self.reused += 1
+        else:
+            self.scanned += 1
+            pages = []
+            try:
+                with ChapterArchive(path) as archive_pages:
+                    for page in archive_pages:
+                        pages.append([page.name, page.size, page.stamp] + probe_image(page))
+            except (BadZipFile, tarfile.TarError, OSError):
+                pages = []
+            entry = {'type': 'archive', 'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'pages': pages}
+        self.entries[path] = entry
+
+    def comic_folders(self):
+        base = self.entries.get(self.base_folder)
+        if not base:
+            return []
+        return [os.path.join(self.base_folder, name) for name in base['dirs']]
+
+    # 与 FileProcessor.get_chapter_paths 相同：漫画文件夹本身、各级子文件夹及其中的压缩包
+    def chapter_paths(self, comic_folder):
+        chapters = [comic_folder]
+        folders = [comic_folder]
+        while folders:
+            folder = folders.pop(0)
+            entry = self.entries.get(folder)
+            if not entry:
+                continue
+            subfolders = [os.path.join(folder, name) for name in entry['dirs']]
+            chapters.extend(subfolders)
+            chapters.extend(os.path.join(folder, name) for name in entry['archives'])
+            folders.extend(subfolders)
+        return chapters
+
+    # 章节的页面记录：[文件名, 大小, 修改时间或 CRC32, 宽, 高, 颜色模式]
+    def pages(self, chapter_path):
+        entry = self.entries.get(chapter_path)
+        return entry['pages'] if entry else []
+
+class BuildManifest:
+    """构建清单，记录每个输出对应的源图片列表（文件名、大小、修改时间、可选内容哈希）与转换选项
+
+    保存在输出文件夹下的 SQLite 数据库中。再次运行时只重新生成源图片或选项发生变化的章节，
+    已有记录在启动时一次性载入内存，判断是否需要生成时不再逐条查询。
+    """
+    FILE_NAME = '.comic-to-pdf-manifest.db'
+    COMMIT_INTERVAL = 200
+
+    def __init__(self, output_folder):
+        path = os.path.join(output_folder, self.FILE_NAME)
+        # 只有首次建立清单时才登记已有的输出；清单存在时，没有记录的输出视为未完成
+        self.adopt_existing = not os.path.exists(path)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS outputs ("
+            "output TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, options TEXT NOT NULL, sources TEXT NOT NULL)"
+        )
+        self.entries = {
+            output: (fingerprint, options)
+            for output, fingerprint, options in self.connection.execute("SELECT output, fingerprint, options FROM outputs")
+        }
+        self.uncommitted = 0
+
+    @staticmethod
+    def fingerprint(sources):
+        return hashlib.sha1(json.dumps(sources).encode('utf-8')).hexdigest()
+
+    # 判断输出是否需要（重新）生成：输出缺失、源图片变化或转换选项变化时返回 True
+    def needs_build(self, output, sources, options, output_exists):
+        entry = self.entries.get(output)
+        if entry is None:
+            if output_exists and self.adopt_existing:
+                # 旧版本生成的输出没有清单记录，直接登记为最新，避免升级后全部重新生成
+                self.record(output, sources, options)
+                return False
+            return True
+        return not output_exists or entry != (self.fingerprint(sources), json.dumps(options, sort_keys=True))
+
+    def record(self, output, sources, options):
+        fingerprint = self.fingerprint(sources)
+        options_text = json.dumps(options, sort_keys=True)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO outputs (output, fingerprint, options, sources) VALUES (?, ?, ?, ?)",
+            (output, fingerprint, options_text, json.dumps(sources, ensure_ascii=False))
+        )
+        self.entries[output] = (fingerprint, options_text)
+        self.uncommitted += 1
+        if self.uncommitted >= self.COMMIT_INTERVAL:
+            self.commit()
+
+    # 删除已不存在的输出的记录
+    def forget(self, output):
+        if self.entries.pop(output, None) is not None:
+            self.connection.execute("DELETE FROM outputs WHERE output = ?", (output,))
+            self.uncommitted += 1
+
+    def commit(self):
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+class JobJournal:
+    """任务日志：以 JSON Lines 追加记录已完成的章节输出与压缩任务，每条记录写入后立即落盘
+
+    构建清单分批提交，程序被强制结束时最近完成的章节可能尚未写入数据库，启动时从日志补录；
+    已计划但未完成的压缩任务也会保留在日志中，下次运行时即使没有章节需要处理也会补做。
+    每次启动补录后日志被压缩为只含未完成的压缩任务，全部完成后删除。
+    """
+    FILE_NAME = '.comic-to-pdf-journal.jsonl'
+
+    def __init__(self, output_folder):
+        self.output_folder = output_folder
+        self.path = os.path.join(output_folder, self.FILE_NAME)
+        self.outputs = []
+        self.pending_archives = {}
+        self.file = None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 最后一行可能在写入时被中断
+                        continue
+                    if record.get('event') == 'output':
+                        self.outputs.append((record['output'], record['sources'], record['options']))
+                    elif record.get('event') == 'archive':
+                        self.pending_archives[record['comic']] = record['folders']
+                    elif record.get('event') == 'archived':
+                        self.pending_archives.pop(record['comic'], None)
+        except OSError:
+            pass
+
+    # 压缩日志（调用方已将补录的输出写入构建清单）并打开以追加记录
+    def open(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for comic_name, folders in self.pending_archives.items():
+                f.write(json.dumps({'event': 'archive', 'comic': comic_name, 'folders': folders}, ensure_ascii=False) + '\n')
+        os.replace(temp_path, self.path)
+        self.outputs = []
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record_output(self, output, sources, options):
+        self.append({'event': 'output', 'output': output, 'sources': sources, 'options': options})
+
+    # 返回漫画尚未完成的压缩任务对应的输出文件夹 (PDF 文件夹, 长图文件夹)，没有时返回 None
+    def pending_archive(self, comic_name):
+        folders = self.pending_archives.get(comic_name)
+        if folders is None:
+            return None
+        return tuple(os.path.join(self.output_folder, folder) if folder else None for folder in folders)
+
+    # 记录计划中的压缩任务，与上次未完成的同一漫画的压缩任务合并
+    def plan_archive(self, comic_name, pdf_folder, long_folder):
+        previous = self.pending_archive(comic_name) or (None, None)
+        folders = [os.path.relpath(folder, self.output_folder) if folder else None
+                   for folder in (pdf_folder or previous[0], long_folder or previous[1])]
+        self.pending_archives[comic_name] = folders
+        self.append({'event': 'archive', 'comic': comic_name, 'folders': folders})
+        return self.pending_archive(comic_name)
+
+    def record_archive(self, comic_name):
+        self.pending_archives.pop(comic_name, None)
+        self.append({'event': 'archived', 'comic': comic_name})
+
+    # 没有未完成的压缩任务时删除日志
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        if not self.pending_archives and os.path.exists(self.path):
+            os.remove(self.path)
+
+class FolderWatcher:
+    """监视输入目录的变化，按漫画（输入目录下的一级子文件夹）汇总
+
+    优先使用 watchdog（Linux 上基于 inotify），未安装时退回定时轮询：每次遍历各漫画文件夹，
+    比较其中文件与子文件夹的大小和修改时间。同一部漫画的多次变化合并为一条待处理记录，
+    最后一次变化后静置 settle_seconds 秒才交给调用方，避免处理上传到一半的章节。
+    待处理记录最多 max_pending 条，超过后不再逐部记录，改为在变化停止后整体处理一遍输入目录
+    （目录索引与构建清单会跳过未变化的部分）；调用方处理一批期间的新变化继续合并，不会无限堆积。
+    """
+    # 只读打开文件（包括本程序读取图片）产生的事件，不代表内容变化
+    IGNORED_EVENTS = ('opened', 'closed_no_write')
+
+    def __init__(self, base_folder, settle_seconds=10, poll_interval=5, max_pending=100, ignore_folder=None):
+        self.base_folder = os.path.abspath(base_folder)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.max_pending = max_pending
+        self.ignore_folder = os.path.abspath(ignore_folder) if ignore_folder else None
+        self.pending = {}
+        self.overflow = False
+        self.last_event = 0
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.observer = None
+        self.poll_thread = None
+        self.backend = None
+
+    def start(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            Observer = None
+        if Observer is not None:
+            watcher = self
+
+            class Handler(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    if event.event_type in FolderWatcher.IGNORED_EVENTS:
+                        return
+                    watcher.notify(event.src_path)
+                    if getattr(event, 'dest_path', None):
+                        watcher.notify(event.dest_path)
+
+            self.observer = Observer()
+            self.observer.schedule(Handler(), self.base_folder, recursive=True)
+            self.observer.start()
+            self.backend = 'watchdog'
+        else:
+            self.poll_thread = threading.Thread(target=self.poll, daemon=True)
+            self.poll_thread.start()
+            self.backend = f"轮询，每 {self.poll_interval} 秒"
+
+    def stop(self):
+        self.stopped.set()
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+        if self.poll_thread is not None:
+            self.poll_thread.join()
+
+    # 将变化的路径归属到漫画名；输入目录本身、根目录下的文件与输出目录中的变化返回 None
+    def comic_for(self, path):
+        path = os.path.abspath(path)
+        if self.ignore_folder and (path == self.ignore_folder or path.startswith(self.ignore_folder + os.sep)):
+            return None
+        relative = os.path.relpath(path, self.base_folder)
+        if relative == os.curdir or relative.startswith(os.pardir):
+            return None
+        parts = relative.split(os.sep)
+        if len(parts) == 1 and not os.path.isdir(path):
+            return None
+        return parts[0]
+
+    def notify(self, path):
+        comic_name = self.comic_for(path)
+        if comic_name is None:
+            return
+        with self.condition:
+            self.last_event = time.monotonic()
+            if not self.overflow:
+                self.pending[comic_name] = self.last_event
+                if len(self.pending) > self.max_pending:
+                    self.overflow = True
+                    self.pending.clear()
+            self.condition.notify_all()
+
+    # 漫画文件夹的签名：其中各文件与子文件夹的相对路径、大小、修改时间
+    def comic_signature(self, folder):
+        entries = []
+        folders = [folder]
+        while folders:
+            current = folders.pop()
+            try:
+                with os.scandir(current) as it:
+                    for item in it:
+                        stat = item.stat()
+                        entries.append((item.path, stat.st_size, stat.st_mtime_ns))
+                        if item.is_dir():
+                            folders.append(item.path)
+            except OSError:
+                continue
+        return hash(frozenset(entries))
+
+    def poll(self):
+        signatures = None
+        while True:
+            current = {}
+            try:
+                names = os.listdir(self.base_folder)
+            except OSError:
+                names = []
+            for name in names:
+                path = os.path.join(self.base_folder, name)
+                if os.path.isdir(path) and self.comic_for(path) is not None:
+                    current[name] = self.comic_signature(path)
+            # 第一次遍历只建立基准，启动时的完整处理已覆盖现有内容
+            if signatures is not None:
+                for name, signature in current.items():
+                    if signatures.get(name) != signature:
+                        self.notify(os.path.join(self.base_folder, name))
+            signatures = current
+            if self.stopped.wait(self.poll_interval):
+                return
+
+    # 等待变化静置：返回可以处理的漫画名列表；待处理记录溢出时返回 None，表示整体处理输入目录；
+    # cancel_event 被设置时返回空列表
+    def wait_settled(self, cancel_event):
+        with self.condition:
+            while not cancel_event.is_set():
+                now = time.monotonic()
+                if self.overflow:
+                    if now - self.last_event >= self.settle_seconds:
+                        self.overflow = False
+                        return None
+                else:
+                    ready = [name for name, changed in self.pending.items() if now - changed >= self.settle_seconds]
+                    if ready:
+                        for name in ready:
+                            del self.pending[name]
+                        return ready
+                self.condition.wait(0.5)
+            return []
+
 class FileProcessor:
     """文件处理类"""
-    def __init__(self, config, logger, progress_bar=None, progress_label=None, gui_root=None, start_button=None, stop_button=None):
+    # 各类输出受哪些配置项影响
+    OUTPUT_OPTION_KEYS = {
+        'pdf': ('image_quality', 'optimize_pdf', 'pdf_max_width', 'pdf_max_height',
+                'pdf_grayscale_detection', 'pdf_grayscale_tolerance', 'pdf_near_duplicates', 'pdf_near_duplicate_distance'),
+        'long': ('long_image_format', 'long_image_compress_level', 'long_image_quality', 'long_image_max_height'),
+        'volume': ('pdf_volume_size',),
+    }
+    # 同时生成 PDF 与长图时缓存的已解码页面数
+    DECODE_CACHE_PAGES = 2
+    # 各图像模式每像素的字节数，用于估算内存
+    MODE_CHANNELS = {'1': 1, 'L': 1, 'P': 1, 'LA': 2, 'I;16': 2, 'RGB': 3, 'YCbCr': 3, 'LAB': 3, 'HSV': 3,
+                     'RGBA': 4, 'RGBX': 4, 'CMYK': 4, 'I': 4, 'F': 4}
+    # 灰度检测：在最长边约为该尺寸的缩小图上判断；超出容差的像素比例不超过该值时视为灰度
+    COLOR_SAMPLE_SIZE = 512
+    COLOR_MAX_PIXEL_RATIO = 0.001
+    # 黑白检测：与纯黑/纯白相差超过灰度容差该倍数的像素都算中间调（默认容差 12 时为 25-230），
+    # 中间调比例不超过该值时视为黑白线稿（JPEG 的振铃噪声也会产生少量中间调）；大片浅灰或深灰的页面保持灰度
+    BILEVEL_TOLERANCE_SCALE = 2
+    BILEVEL_MAX_MIDTONE_RATIO = 0.08
+    # ZIP 压缩：每段样本的大小；样本压缩后超过原大小该比例的文件直接存储；单个压缩结果超过该大小时暂存到磁盘
+    ARCHIVE_SAMPLE_SIZE = 64 * 1024
+    ARCHIVE_STORE_RATIO = 0.95
+    ARCHIVE_SPOOL_SIZE = 16 * 1024 * 1024
+
+    # progress_callback(completed, total) 在每个任务完成后调用；
+    # finished_callback(summary) 在处理结束（完成、取消或出错）后调用，summary 与 process_folders 的返回值相同。
+    # cancel_event 为取消标志，默认新建一个可在进程间共享的 multiprocessing.Event，
+    # 进程池的子进程通过初始化函数继承同一个标志；页面循环每处理一页前检查一次
+    def __init__(self, config, logger, progress_callback=None, finished_callback=None, cancel_event=None):
         self.config = config
         self.logger = logger
-        self.stop_flag = False
-        self.progress_bar = progress_bar
-        self.progress_label = progress_label
-        self.gui_root = gui_root
-        self.start_button = start_button
-        self.stop_button = stop_button
+        self.cancel_event = cancel_event if cancel_event is not None else multiprocessing.Event()
+        self.progress_callback = progress_callback
+        self.finished_callback = finished_callback
+        self.tracer = Tracer(bool(config.get('trace_stages')))
         self.executor = None  # 添加线程池引用
         
     # 获取当前主程序的根目录
@@ -126,159 +1539,954 @@ class FileProcessor:
         image_files = [
             os.path.join(folder_path, file_name)
             for file_name in os.listdir(folder_path)
-            if file_name.lower().endswith(('png', 'jpg', 'jpeg', 'webp'))
+            if file_name.lower().endswith(IMAGE_EXTENSIONS)
         ]
         return natsorted(image_files)
 
-    # 将图片合并为 PDF 文件
+    # 获取漫画下的所有章节：漫画文件夹本身、各级子文件夹，以及其中的 CBZ/ZIP/TAR 压缩包
+    def get_chapter_paths(self, comic_folder):
+        chapters = [comic_folder]
+        for root, dirs, files in os.walk(comic_folder):
+            chapters.extend(os.path.join(root, dir_name) for dir_name in dirs)
+            chapters.extend(os.path.join(root, file_name) for file_name in files if is_archive_file(file_name))
+        return chapters
+
+    # 章节名称：文件夹名，压缩包则去掉扩展名
+    def get_chapter_name(self, chapter_path):
+        name = os.path.basename(chapter_path)
+        for extension in ARCHIVE_EXTENSIONS:
+            if name.lower().endswith(extension):
+                return name[:-len(extension)]
+        return name
+
+    # 打开章节，在 with 语句中得到按自然顺序排列的页面列表；压缩包章节在离开时关闭
+    # page_names 为扫描索引中记录的文件名，提供时文件夹章节不再重复列目录
+    def open_chapter(self, chapter_path, page_names=None):
+        if is_archive_file(chapter_path) and os.path.isfile(chapter_path):
+            return ChapterArchive(chapter_path)
+        if page_names is not None:
+            return nullcontext([os.path.join(chapter_path, name) for name in page_names])
+        return nullcontext(self.get_images_in_folder(chapter_path))
+
+    # 扫描章节中的图片，返回按自然顺序排列的 [文件名, 大小, 修改时间] 列表，供构建清单比对
+    # 压缩包章节使用条目的大小与 CRC32（TAR 为修改时间）；提供扫描索引时直接使用索引中的记录
+    def scan_chapter_sources(self, folder_path, index=None):
+        if index is not None:
+            sources = [page[:3] for page in index.pages(folder_path)]
+            if self.config.get('manifest_content_hash') and not is_archive_file(folder_path):
+                self.append_content_hashes(folder_path, sources)
+            return sources
+
+        if is_archive_file(folder_path) and os.path.isfile(folder_path):
+            try:
+                with ChapterArchive(folder_path) as pages:
+                    return [[page.name, page.size, page.stamp] for page in pages]
+            except (BadZipFile, tarfile.TarError, OSError) as e:
+                self.logger.log(f"⚠️ 无法读取压缩包章节 {folder_path}，原因：{e}\n")
+                return []
+
+        sources = []
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    sources.append([entry.name, stat.st_size, stat.st_mtime_ns])
+        sources = natsorted(sources, key=lambda source: source[0])
+        if self.config.get('manifest_content_hash'):
+            self.append_content_hashes(folder_path, sources)
+        return sources
+
+    # 可选：附加内容哈希，可发现修改时间未变化的内容改动，但需要读取全部文件
+    def append_content_hashes(self, folder_path, sources):
+        for source in sources:
+            digest = hashlib.blake2b()
+            with open(os.path.join(folder_path, source[0]), 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            source.append(digest.hexdigest())
+
+    # 影响输出内容的转换选项，记录在构建清单中，选项变化时重新生成
+    def output_options(self, kind):
+        return {key: self.config.get(key) for key in self.OUTPUT_OPTION_KEYS[kind]}
+
+    # 页面超过设置的最大宽度/高度时，返回按比例缩小后的尺寸；无需缩小时返回 None
+    def pdf_target_size(self, width, height):
+        scale = 1.0
+        max_width = self.config.get('pdf_max_width') or 0
+        max_height = self.config.get('pdf_max_height') or 0
+        if max_width and width > max_width:
+            scale = min(scale, max_width / width)
+        if max_height and height > max_height:
+            scale = min(scale, max_height / height)
+        if scale >= 1.0:
+            return None
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    # 读取章节各页的文件头，返回 [宽, 高, 模式] 列表（未启用目录索引时用于估算内存）
+    def probe_chapter(self, chapter_path):
+        with self.open_chapter(chapter_path) as image_files:
+            return [probe_image(page) for page in image_files]
+
+    # 按文件头尺寸估算处理一个章节时的内存峰值（字节），dimensions 为 [宽, 高, 模式] 列表。
+    # PDF：解码缓存中的页面加上转换为 RGB 的临时副本；长图：填充中与编码中的分段画布（流式 PNG 只需当前页的行数据）；
+    # 另加预读缓冲区。只用于调度时的准入控制，不要求精确
+    def estimate_chapter_memory(self, dimensions, generate_pdf, merge_to_long_image):
+        dimensions = [(width, height, mode) for width, height, mode in dimensions if width and height]
+        if not dimensions:
+            return 0
+        largest_page = max(width * height * self.MODE_CHANNELS.get(mode, 3) for width, height, mode in dimensions)
+        largest_rgb = max(width * height * 3 for width, height, _ in dimensions)
+        estimate = int(self.config.get('prefetch_mb') or 0) * 1048576
+        if generate_pdf:
+            estimate += largest_page * self.DECODE_CACHE_PAGES + largest_rgb
+        if merge_to_long_image:
+            max_width = max(width for width, _, _ in dimensions)
+            scaled_heights = [height if width == max_width else int(height * max_width / width)
+                              for width, height, _ in dimensions]
+            image_format = self.config.get('long_image_format')
+            segment_heights = LongImageWriter.plan_segments(
+                image_format, sum(scaled_heights), self.config.get('long_image_max_height'))
+            # 当前页解码结果与放大后的行数据
+            estimate += largest_page + max_width * max(scaled_heights) * 3
+            if image_format != 'png' or len(segment_heights) > 1:
+                # 一张填充中的画布，加上最多 2 个编码中的分段
+                canvases = min(len(segment_heights), 3)
+                estimate += max_width * segment_heights[0] * 3 * canvases
+        return estimate
+
+    # 解码并缩小到目标尺寸：JPEG 用 draft() 在 DCT 解码时直接按 1/2、1/4、1/8 缩小
+    def decode_scaled(self, img, target_size):
+        with self.tracer.span('decode', format=img.format):
+            if img.format == 'JPEG':
+                img.draft('L' if img.mode == 'L' else 'RGB', target_size)
+            img.load()
+        return self.scale_to(img, target_size)
+
+    # 先用 reduce() 做整数倍缩小，再用 LANCZOS 缩放到精确尺寸
+    def scale_to(self, img, target_size):
+        if img.mode not in ('L', 'RGB', 'RGBA'):
+            with self.tracer.span('convert', mode=img.mode):
+                img = self.to_scalable_mode(img)
+        with self.tracer.span('resize'):
+            factor = min(img.width // target_size[0], img.height // target_size[1])
+            if factor >= 2:
+                img = img.reduce(factor)
+            if img.size != target_size:
+                img = img.resize(target_size, Image.LANCZOS)
+        return img
+
+    # reduce() 不支持调色板、1 位和 16 位图片（image has wrong mode），缩放前转换为 L/RGB/RGBA：
+    # 16 位灰度按比例缩到 8 位（直接 convert('L') 会截断为全白），其余按是否带透明通道展开为 RGB 或 RGBA
+    def to_scalable_mode(self, img):
+        if img.mode in ('I', 'I;16', 'I;16B', 'I;16L', 'I;16N'):
+            return img.convert('I').point(lambda value: value * (1 / 256)).convert('L')
+        if img.mode == '1':
+            return img.convert('L')
+        if img.mode in ('LA', 'La', 'PA', 'RGBa') or 'transparency' in img.info:
+            return img.convert('RGBA')
+        return img.convert('RGB')
+
+    # 读取一页图片的原始数据
+    def read_page(self, img_path):
+        with self.tracer.span('read') as span, open_page(img_path) as f:
+            data = f.read()
+            span.set(bytes_in=len(data))
+        return data
+
+    # 完整解码一页图片
+    def decode_page(self, data):
+        img = Image.open(BytesIO(data))
+        with self.tracer.span('decode', format=img.format):
+            img.load()
+        return img
+
+    # 读取单页图片，返回可写入 PDF 的图像流：JPEG/PNG 原样嵌入，其余格式解码后重新编码
+    def load_pdf_page(self, img_path):
+        return self.pdf_page_from_data(self.read_page(img_path))
+
+    # 感知哈希（dHash）：缩小为 9×9 灰度图，分别比较水平与垂直相邻像素的明暗，得到 128 位指纹；
+    # 只比较一个方向时，大面积留白或纵向渐变的页面指纹全为 0，容易误判。JPEG 按 1/8 比例解码
+    def perceptual_hash(self, data):
+        with Image.open(BytesIO(data)) as img:
+            img.draft('L', (64, 64))
+            pixels = list(img.convert('L').resize((9, 9), Image.BILINEAR).getdata())
+        value = 0
+        for row in range(8):
+            for column in range(8):
+                index = row * 9 + column
+                value = value << 2 | (pixels[index] > pixels[index + 1]) << 1 | (pixels[index] > pixels[index + 9])
+        return value
+
+    # 与本章已出现的页面比较感知哈希，返回第一个近似重复的页面，没有时返回 None；page_hashes 为 [(哈希, 页面)]
+    def find_near_duplicate(self, data, img_path, page_hashes):
+        with self.tracer.span('phash'):
+            value = self.perceptual_hash(data)
+        distance = self.config.get('pdf_near_duplicate_distance')
+        for other, other_path in page_hashes:
+            if bin(value ^ other).count('1') <= distance:
+                return other_path
+        page_hashes.append((value, img_path))
+        return None
+
+    # 判断页面颜色：'color' 彩色，'gray' 灰度，'bilevel' 黑白线稿。
+    # 在缩小后的图像上用 ImageChops 计算通道间差异，用直方图统计超出容差的像素比例；
+    # 缩小会把线条边缘变成灰色，因此中间调比例在原尺寸上统计
+    def classify_page_colors(self, img):
+        if img.mode not in ('L', 'RGB'):
+            img = img.convert('RGB')
+
+        if img.mode == 'RGB':
+            sample = img
+            factor = max(img.size) // self.COLOR_SAMPLE_SIZE
+            if factor >= 2:
+                sample = img.reduce(factor)
+            red, green, blue = sample.split()
+            difference = ImageChops.lighter(ImageChops.difference(red, green), ImageChops.difference(green, blue))
+            tolerance = self.config.get('pdf_grayscale_tolerance')
+            colored = sum(difference.histogram()[tolerance + 1:])
+            if colored > sample.width * sample.height * self.COLOR_MAX_PIXEL_RATIO:
+                return 'color'
+            img = img.convert('L')
+
+        band = self.config.get('pdf_grayscale_tolerance') * self.BILEVEL_TOLERANCE_SCALE
+        midtones = sum(img.histogram()[band + 1:255 - band])
+        return 'bilevel' if midtones <= img.width * img.height * self.BILEVEL_MAX_MIDTONE_RATIO else 'gray'
+
+    # 以 PNG 编码后取出 IDAT，作为 Flate 图像流嵌入（用于灰度与 1 位黑白页面，无损）
+    def flate_page(self, img):
+        buffer = BytesIO()
+        img.save(buffer, format='PNG')
+        width, height, color_space, decode_parms, idat, bits = parse_png_for_pdf(buffer.getvalue())
+        return idat, width, height, color_space, 'FlateDecode', decode_parms, bits
+
+    def jpeg_page(self, img):
+        buffer = BytesIO()
+        img.save(
+            buffer,
+            format='JPEG',
+            quality=self.config.get('image_quality'),
+            optimize=self.config.get('optimize_pdf')
+        )
+        color_space = 'DeviceRGB' if img.mode == 'RGB' else 'DeviceGray'
+        return buffer.getvalue(), img.width, img.height, color_space, 'DCTDecode', None, 8
+
+    # 可直接嵌入 PDF 的原图：8 位灰度/RGB 与 1 位灰度 PNG 的 IDAT，以及 RGB/灰度 JPEG；其余返回 None
+    # （CMYK/YCCK 的 JPEG 在各阅读器中的反相处理不一致，交给 Pillow 转换）
+    def passthrough_page(self, img, data, png):
+        if png:
+            width, height, color_space, decode_parms, idat, bits = png
+            return idat, width, height, color_space, 'FlateDecode', decode_parms, bits
+        if img.format == 'JPEG' and img.mode in ('RGB', 'L'):
+            color_space = 'DeviceRGB' if img.mode == 'RGB' else 'DeviceGray'
+            return data, img.width, img.height, color_space, 'DCTDecode', None, 8
+        return None
+
+    # 根据图片数据生成 PDF 页面所需的 (数据, 宽, 高, 颜色空间, 过滤器, 解码参数, 位深)；
+    # decoded 为返回已解码图像的函数，同时生成长图时传入，需要像素的页面直接复用长图的解码结果；
+    # report 为字典时累计灰度/黑白页数，以及比直接嵌入原图节省的字节数
+    def pdf_page_from_data(self, data, decoded=None, report=None):
+        detect_colors = self.config.get('pdf_grayscale_detection')
+        png = parse_png_for_pdf(data)
+        with Image.open(BytesIO(data)) as img:
+            target_size = self.pdf_target_size(img.width, img.height)
+            passthrough = None if target_size else self.passthrough_page(img, data, png)
+            if passthrough and (not detect_colors or passthrough[6] == 1):
+                return passthrough
+
+            page_colors = 'color'
+            if passthrough and passthrough[4] == 'DCTDecode':
+                # JPEG 只按 1/2 比例解码用于判断；只有黑白线稿才重新编码，其余仍直接嵌入原图。
+                # 同时生成长图时直接使用长图的完整解码结果，缩小一半后判断，与单独生成 PDF 时的结果一致
+                if decoded is not None:
+                    sample = decoded()
+                    if min(sample.size) >= 2:
+                        sample = sample.reduce(2)
+                else:
+                    sample = img
+                    with self.tracer.span('decode', format=img.format):
+                        img.draft(img.mode, (max(1, img.width // 2), max(1, img.height // 2)))
+                        img.load()
+                with self.tracer.span('classify'):
+                    page_colors = self.classify_page_colors(sample)
+                if page_colors != 'bilevel':
+                    return passthrough
+                img = decoded() if decoded is not None else self.decode_page(data)
+            else:
+                # 无法直接嵌入或需要缩小的图片（如 WebP、带透明通道的 PNG）经 Pillow 解码
+                if decoded is not None:
+                    img = decoded()
+                    if target_size:
+                        img = self.scale_to(img, target_size)
+                elif target_size:
+                    img = self.decode_scaled(img, target_size)
+                else:
+                    with self.tracer.span('decode', format=img.format):
+                        img.load()
+                if detect_colors:
+                    with self.tracer.span('classify'):
+                        page_colors = self.classify_page_colors(img)
+
+            # 彩色页面，以及原本就是灰度的 PNG：能直接嵌入的保持原图，其余重新编码为 JPEG
+            if page_colors == 'color' or (page_colors == 'gray' and passthrough and passthrough[3] == 'DeviceGray'):
+                if passthrough:
+                    return passthrough
+                if img.mode not in ('RGB', 'L'):
+                    with self.tracer.span('convert', mode=img.mode):
+                        img = img.convert('RGB')
+                with self.tracer.span('pdf.encode') as span:
+                    page = self.jpeg_page(img)
+                    span.set(bytes_out=len(page[0]))
+                return page
+
+            # 灰度页面保存为 8 位灰度（原图为 PNG 时无损 Flate，否则 JPEG），黑白页面保存为 1 位 Flate
+            with self.tracer.span('convert', mode=img.mode):
+                img = img.convert('L')
+                if page_colors == 'bilevel':
+                    img = img.point(lambda value: 255 if value >= 128 else 0).convert('1', dither=Image.Dither.NONE)
+            with self.tracer.span('pdf.encode') as span:
+                if page_colors == 'bilevel' or passthrough:
+                    page = self.flate_page(img)
+                else:
+                    page = self.jpeg_page(img)
+                span.set(bytes_out=len(page[0]))
+
+        if report is not None:
+            report[page_colors] = report.get(page_colors, 0) + 1
+            if passthrough:
+                report['saved'] = report.get('saved', 0) + len(passthrough[0]) - len(page[0])
+        return page
+
+    # 将图片合并为 PDF 文件，逐页读取并写出，内存占用只与单页大小有关；成功时返回 True
     def create_pdf_from_images(self, image_files, output_pdf):
-        images = []
-        for img_path in image_files:
+        return 'pdf' in self.create_outputs_from_images(image_files, output_pdf=output_pdf)
+
+    # 压缩文件夹为 ZIP，已有压缩包时增量更新：
+    # 只新增文件时直接追加；有文件被修改或删除时写入临时文件，完成后再替换原压缩包；
+    # 压缩方式与已有压缩包不同时（记录在压缩包注释中）整个重新打包
+    def zip_folder(self, folder_path, zip_name):
+        zip_path = os.path.join(os.path.dirname(folder_path), f"{zip_name}.zip")
+
+        files = {}
+        for root, _, names in os.walk(folder_path):
+            for name in names:
+                # 跳过正在写入或中途退出时留下的临时文件
+                if name.endswith('.tmp'):
+                    continue
+                file_path = os.path.join(root, name)
+                info = ZipInfo.from_file(file_path, os.path.relpath(file_path, folder_path))
+                files[info.filename] = (file_path, info)
+
+        comment = self.archive_comment()
+        existing = None
+        if os.path.exists(zip_path):
             try:
-                img = Image.open(img_path)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                images.append(img)
-            except Exception as e:
-                self.logger.log(f"错误：无法处理图片 {img_path}，原因：{e}\n")
+                with ZipFile(zip_path) as zipf:
+                    if zipf.comment == comment:
+                        existing = {info.filename: info for info in zipf.infolist()}
+                        directory_offset = zipf.start_dir
+                    else:
+                        self.logger.log(f"🔄 压缩方式已更改，将重新打包：{zip_path}\n")
+            except (BadZipFile, OSError) as e:
+                self.logger.log(f"⚠️ 已有 ZIP 无法读取，将重新打包：{zip_path}，原因：{e}\n")
+
+        if existing is None:
+            self.rewrite_zip(zip_path, files, {}, comment)
+            self.logger.log(f"📦 文件夹已打包为 ZIP：{zip_path}\n")
+            return
 
-        if images:
+        unchanged = {
+            arcname for arcname, (_, info) in files.items()
+            if arcname in existing and self.zip_entry_matches(existing[arcname], info)
+        }
+        added = [arcname for arcname in files if arcname not in existing]
+        if len(unchanged) == len(existing) and not added:
+            self.logger.log(f"📦 ZIP 已是最新，无需更新：{zip_path}\n")
+        elif len(unchanged) == len(existing):
+            # 新条目从原中央目录的位置开始写入；取消时已追加的条目保留，关闭时重新写入目录，压缩包仍然完整可用
+            writer = ZipArchiveWriter(zip_path, existing.values(), directory_offset, comment)
             try:
-                images[0].save(
-                    output_pdf, 
-                    save_all=True, 
-                    append_images=images[1:], 
-                    quality=self.config.get('image_quality'),
-                    optimize=self.config.get('optimize_pdf')
-                )
-                self.logger.log(f"✅ PDF 已保存：{output_pdf}\n")
-            except Exception as e:
-                self.logger.log(f"❌ PDF 生成失败：{output_pdf}，原因：{e}\n")
+                self.write_archive_members(writer, [files[arcname] + (None,) for arcname in added])
+            finally:
+                writer.close()
+            self.logger.log(f"📦 已向 ZIP 追加 {len(added)} 个文件：{zip_path}\n")
         else:
-            self.logger.log(f"⚠️ 未找到图片，跳过生成：{output_pdf}\n")
+            self.rewrite_zip(zip_path, files, {arcname: existing[arcname] for arcname in unchanged}, comment)
+            self.logger.log(f"📦 ZIP 已更新（保留 {len(unchanged)} 个、写入 {len(files) - len(unchanged)} 个文件）：{zip_path}\n")
+
+    # 压缩包注释记录压缩方式，用于判断已有压缩包能否增量更新；不压缩时为空，与旧版本生成的压缩包一致
+    def archive_comment(self):
+        compression = self.config.get('archive_compression')
+        if compression == 'stored':
+            return b""
+        return f"Comic-to-PDF {compression} {self.config.get('archive_compress_level')}".encode()
+
+    # 按顺序写入压缩包条目：members 为 (文件路径, ZipInfo, 原压缩包中的 ZipInfo 或 None)。
+    # 需要压缩的文件在线程池中并行压缩（zlib/bz2/lzma 压缩时释放 GIL），写入线程按原顺序依次拼接；
+    # 同时在途的条目不超过线程数的两倍，压缩结果超过内存阈值时暂存到输出目录下的临时文件
+    def write_archive_members(self, writer, members, source=None):
+        workers = max(1, self.config.get('archive_workers') or 1)
+        spool_dir = os.path.dirname(os.path.abspath(writer.path))
+        members = iter(members)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while True:
+                    while len(pending) < workers * 2:
+                        member = next(members, None)
+                        if member is None:
+                            break
+                        file_path, info, archived = member
+                        if archived is not None:
+                            pending.append((archived, None))
+                        else:
+                            pending.append((info, executor.submit(self.compress_archive_member, file_path, info, spool_dir)))
+                    if not pending:
+                        break
+                    if self.cancel_event.is_set():
+                        raise ProcessingCancelled()
+                    info, future = pending.popleft()
+                    if future is None:
+                        writer.copy_entry(source, info)
+                        continue
+                    info, data = future.result()
+                    with data:
+                        writer.write_entry(info, data)
+            finally:
+                for _, future in pending:
+                    if future is not None and not future.cancel() and future.exception() is None:
+                        future.result()[1].close()
+
+    # 压缩单个文件，返回填好 CRC 和大小的 ZipInfo 及从头读取的条目数据。先压缩文件开头、中间、结尾的样本估算压缩率，
+    # 压缩后仍超过 ARCHIVE_STORE_RATIO 的文件（JPEG、图片已压缩的 PDF 等）直接存储，省去无效的压缩
+    def compress_archive_member(self, file_path, info, spool_dir):
+        method = ZipArchiveWriter.COMPRESSIONS[self.config.get('archive_compression')]
+        level = self.config.get('archive_compress_level')
+        if method != ZIP_STORED and self.sample_compression_ratio(file_path, method, level) > self.ARCHIVE_STORE_RATIO:
+            method = ZIP_STORED
+        info.compress_type = method
+        info.flag_bits = 0x02 if method == ZIP_LZMA else 0
+        crc = size = 0
+        if method == ZIP_STORED:
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(ZipArchiveWriter.COPY_CHUNK), b""):
+                    crc = zlib.crc32(chunk, crc)
+                    size += len(chunk)
+            info.CRC, info.file_size, info.compress_size = crc, size, size
+            return info, open(file_path, 'rb')
+
+        compressor = ZipArchiveWriter.compressor(method, level)
+        spool = tempfile.SpooledTemporaryFile(self.ARCHIVE_SPOOL_SIZE, dir=spool_dir)
+        try:
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(ZipArchiveWriter.COPY_CHUNK), b""):
+                    if self.cancel_event.is_set():
+                        raise ProcessingCancelled()
+                    crc = zlib.crc32(chunk, crc)
+                    size += len(chunk)
+                    spool.write(compressor.compress(chunk))
+            spool.write(compressor.flush())
+        except BaseException:
+            spool.close()
+            raise
+        info.CRC, info.file_size, info.compress_size = crc, size, spool.tell()
+        spool.seek(0)
+        return info, spool
+
+    # 用文件开头、中间、结尾各一段样本的压缩结果估算整个文件的压缩率（压缩后 / 压缩前）
+    def sample_compression_ratio(self, file_path, method, level):
+        size = os.path.getsize(file_path)
+        sample_size = self.ARCHIVE_SAMPLE_SIZE
+        compressor = ZipArchiveWriter.compressor(method, level)
+        sampled = compressed = 0
+        with open(file_path, 'rb') as f:
+            offsets = [0] if size <= sample_size * 3 else [0, (size - sample_size) // 2, size - sample_size]
+            for offset in offsets:
+                f.seek(offset)
+                chunk = f.read(sample_size * 3 if len(offsets) == 1 else sample_size)
+                sampled += len(chunk)
+                compressed += len(compressor.compress(chunk))
+        compressed += len(compressor.flush())
+        return compressed / sampled if sampled else 1.0
+
+    # 删除输出文件夹中上次中途退出时留下的临时文件
+    def remove_temp_files(self, folder_path):
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if entry.name.endswith('.tmp') and entry.is_file():
+                    os.remove(entry.path)
+
+    # 大小和修改时间（ZIP 时间精度为 2 秒）都相同时认为文件未变化
+    def zip_entry_matches(self, archived, current):
+        archived_time = archived.date_time[:5] + (archived.date_time[5] // 2,)
+        current_time = current.date_time[:5] + (current.date_time[5] // 2,)
+        return archived.file_size == current.file_size and archived_time == current_time
+
+    # 将压缩包完整写入临时文件后原子替换，中途失败不会破坏原有压缩包；
+    # unchanged 为未变化的条目（原压缩包中的 ZipInfo），其数据从原压缩包原样复制，不解压也不重新压缩
+    def rewrite_zip(self, zip_path, files, unchanged, comment=b""):
+        temp_path = f"{zip_path}.tmp"
+        try:
+            writer = ZipArchiveWriter(temp_path, comment=comment)
+            source = open(zip_path, 'rb') if unchanged else None
+            try:
+                self.write_archive_members(writer, [
+                    (file_path, info, unchanged.get(arcname)) for arcname, (file_path, info) in files.items()
+                ], source)
+            finally:
+                writer.close()
+                if source:
+                    source.close()
+            os.replace(temp_path, zip_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    # 只读取图片文件头获取尺寸，计算长图中每一页缩放后的高度
+    # page_sizes 为扫描索引中记录的尺寸，提供时无需再打开图片
+    def plan_long_image(self, image_files, page_sizes=None):
+        if not page_sizes or len(page_sizes) != len(image_files):
+            page_sizes = [None] * len(image_files)
+        layout = []
+        max_width = 0
+        for img_path, size in zip(image_files, page_sizes):
+            try:
+                if size and size[0] and size[1]:
+                    width, height = size
+                else:
+                    with open_page(img_path) as f, Image.open(f) as img:
+                        width, height = img.size
+                max_width = max(max_width, width)
+                layout.append((img_path, width, height))
+            except Exception as e:
+                self.logger.log(f"错误：无法读取图片 {img_path}，原因：{e}\n")
 
-    # 压缩文件夹为 ZIP
-    def zip_folder(self, folder_path, zip_name):
-        zip_path = os.path.join(os.path.dirname(folder_path), f"{zip_name}.zip")
-        with ZipFile(zip_path, 'w', compression=ZIP_STORED) as zipf:
-            for root, _, files in os.walk(folder_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, folder_path)
-                    zipf.write(file_path, arcname)
-        self.logger.log(f"📦 文件夹已打包为 ZIP：{zip_path}\n")
-
-    # 将图片纵向合并为一张长图
-    def create_long_image_from_images(self, image_files, output_long_image):
-        if not image_files:
-            self.logger.log(f"⚠️ 未找到图片，跳过生成：{output_long_image}\n")
+        # 宽度不足的图片按比例放大到最大宽度
+        layout = [
+            (img_path, width, height, height if width == max_width else int(height * max_width / width))
+            for img_path, width, height in layout
+        ]
+        total_height = sum(scaled_height for _, _, _, scaled_height in layout)
+        return layout, max_width, total_height
+
+    # 章节长图输出的基础路径（不含分段序号与扩展名）
+    def long_image_output_base(self, long_output_folder, chapter_name):
+        return os.path.join(long_output_folder, f"{chapter_name}_long")
+
+    # 判断章节长图是否已生成（未分段的文件或分段后的第一个文件存在即视为已生成）
+    def long_image_exists(self, long_output_folder, chapter_name):
+        base = self.long_image_output_base(long_output_folder, chapter_name)
+        extension = LongImageWriter.extension_for(self.config.get('long_image_format'))
+        return os.path.exists(f"{base}.{extension}") or os.path.exists(f"{base}_001.{extension}")
+
+    # 删除章节已有的长图文件（包括其他格式和旧的分段），keep 中的文件除外；
+    # 新长图替换为正式文件后调用，避免残留过期分段，生成失败或取消时上次的长图仍然保留
+    def remove_long_image_outputs(self, output_base, keep=()):
+        folder = os.path.dirname(output_base)
+        prefix = os.path.basename(output_base)
+        if not os.path.isdir(folder):
             return
-
+        for file_name in os.listdir(folder):
+            stem, extension = os.path.splitext(file_name)
+            if extension[1:] not in LongImageWriter.FORMAT_EXTENSIONS.values():
+                continue
+            suffix = stem[len(prefix):]
+            path = os.path.join(folder, file_name)
+            if (stem.startswith(prefix) and (suffix == '' or (suffix[:1] == '_' and suffix[1:].isdigit()))
+                    and path not in keep):
+                os.remove(path)
+
+    # 将图片纵向合并为长图，逐张解码并按行写入编码器，超过最大高度时自动分段；成功时返回 True
+    def create_long_image_from_images(self, image_files, output_base, page_sizes=None):
+        return 'long' in self.create_outputs_from_images(image_files, output_base=output_base, page_sizes=page_sizes)
+
+    # 规划长图布局并创建写入器，返回 (写入器, 布局, 宽度)；没有可用图片或出错时记录日志并返回 None
+    def open_long_image(self, image_files, output_base, page_sizes=None):
         try:
-            # 计算尺寸时复用已打开的图片对象
-            images_info = []
-            max_width = 0
-            total_height = 0
-            
-            # 批量处理图片信息
-            for img_path in image_files:
+            with self.tracer.span('long.plan', pages=len(image_files)):
+                layout, max_width, total_height = self.plan_long_image(image_files, page_sizes)
+            if not layout:
+                self.logger.log(f"⚠️ 没有可用的图片，跳过生成：{output_base}\n")
+                return None
+
+            writer = LongImageWriter(
+                output_base,
+                max_width,
+                total_height,
+                image_format=self.config.get('long_image_format'),
+                max_height=self.config.get('long_image_max_height'),
+                compress_level=self.config.get('long_image_compress_level'),
+                quality=self.config.get('long_image_quality')
+            )
+            return writer, layout, max_width
+        except Exception as e:
+            self.logger.log(f"❌ 长图生成失败：{output_base}，原因：{e}\n")
+            return None
+
+    # 将解码后的页面转换为长图的 RGB 行数据，宽度不足的页面按比例放大
+    def long_image_rows(self, img, width, max_width, scaled_height):
+        if img.mode != 'RGB':
+            with self.tracer.span('convert', mode=img.mode):
+                img = img.convert('RGB')
+        if width != max_width:
+            with self.tracer.span('resize'):
+                img = img.resize((max_width, scaled_height), Image.LANCZOS)
+        return img.tobytes()
+
+    # 逐页生成 PDF 与长图，output_pdf / output_base 为 None 时不生成对应的输出。
+    # 每页只读取一次；两种输出都需要像素时也只解码一次，解码结果经小型 LRU 缓存共享。
+    # 返回成功生成的输出类型列表
+    # report 为字典时记入重复页统计：duplicate_pages / duplicate_bytes / near_duplicates
+    def create_outputs_from_images(self, image_files, output_pdf=None, output_base=None, page_sizes=None, report=None):
+        built = []
+        if not image_files:
+            for output_path in (output_pdf, output_base):
+                if output_path:
+                    self.logger.log(f"⚠️ 未找到图片，跳过生成：{output_path}\n")
+            return built
+
+        long_writer = None
+        long_layout = {}
+        max_width = 0
+        if output_base:
+            long_image = self.open_long_image(image_files, output_base, page_sizes)
+            if long_image:
+                long_writer, layout, max_width = long_image
+                long_layout = {entry[0]: entry for entry in layout}
+
+        pdf_writer = None
+        pdf_enabled = bool(output_pdf)
+        color_report = {}
+        report = {} if report is None else report
+        # 相同的源图片只编码一次，之后的页面直接引用已写入的图像
+        deduplicate = self.config.get('pdf_deduplicate_pages')
+        near_duplicates = self.config.get('pdf_near_duplicates')
+        page_hashes = []
+        cache = DecodedPageCache(self.DECODE_CACHE_PAGES)
+        # 按处理顺序在后台预读页面数据，读取与解码、编码重叠进行
+        pages = [img_path for img_path in image_files if pdf_enabled or img_path in long_layout]
+        prefetch_bytes = int(self.config.get('prefetch_mb') or 0) * 1048576
+        prefetcher = PagePrefetcher(pages, self.read_page, prefetch_bytes) if prefetch_bytes and len(pages) > 1 else None
+        cancelled = False
+        try:
+            for index, img_path in enumerate(pages):
+                if self.cancel_event.is_set():
+                    cancelled = True
+                    break
+                entry = long_layout.get(img_path) if long_writer else None
                 try:
-                    with Image.open(img_path) as img:
-                        width, height = img.size
-                        max_width = max(max_width, width)
-                        total_height += height
-                        images_info.append((img_path, width, height))
+                    data = prefetcher.get(index) if prefetcher else self.read_page(img_path)
+                    decoded = partial(cache.get, img_path, partial(self.decode_page, data))
                 except Exception as e:
                     self.logger.log(f"错误：无法读取图片 {img_path}，原因：{e}\n")
+                    data = decoded = None
+                if not pdf_enabled and entry is None:
                     continue
 
-            if not images_info:
-                self.logger.log(f"⚠️ 没有可用的图片，跳过生成：{output_long_image}\n")
-                return
-
-            # 创建目标长图
-            long_image = Image.new('RGB', (max_width, total_height))
-            y_offset = 0
-
-            # 分批处理图片以优化内存使用
-            BATCH_SIZE = 5
-            for i in range(0, len(images_info), BATCH_SIZE):
-                batch = images_info[i:i + BATCH_SIZE]
-                
-                for img_path, width, height in batch:
+                if pdf_enabled and data is not None:
+                    source_key = hashlib.blake2b(data, digest_size=16).digest() if deduplicate else None
+                    duplicate_of = None
+                    if near_duplicates in ('report', 'skip'):
+                        try:
+                            duplicate_of = self.find_near_duplicate(data, img_path, page_hashes)
+                        except Exception as e:
+                            self.logger.log(f"错误：无法计算感知哈希 {img_path}，原因：{e}\n")
+                        if duplicate_of is not None:
+                            report['near_duplicates'] = report.get('near_duplicates', 0) + 1
+                            self.logger.log(f"  🔁 近似重复页：{img_path} ≈ {duplicate_of}"
+                                            f"{'，已跳过' if near_duplicates == 'skip' else ''}\n")
+                    page = None
+                    if near_duplicates == 'skip' and duplicate_of is not None:
+                        pass
+                    elif pdf_writer is not None and source_key is not None and pdf_writer.add_duplicate_page(source_key):
+                        pass
+                    else:
+                        try:
+                            page = self.pdf_page_from_data(data, decoded if long_writer else None, color_report)
+                        except Exception as e:
+                            self.logger.log(f"错误：无法处理图片 {img_path}，原因：{e}\n")
+                    if page:
+                        try:
+                            with self.tracer.span('pdf.write', bytes_out=len(page[0])):
+                                if pdf_writer is None:
+                                    pdf_writer = PdfWriter(output_pdf, deduplicate=deduplicate)
+                                pdf_writer.add_image_page(*page, source_key=source_key)
+                        except Exception as e:
+                            if pdf_writer is not None:
+                                pdf_writer.abort()
+                            pdf_writer = None
+                            pdf_enabled = False
+                            self.logger.log(f"❌ PDF 生成失败：{output_pdf}，原因：{e}\n")
+                        page = None
+
+                if entry is not None:
+                    _, width, _, scaled_height = entry
+                    rows = None
+                    if decoded is not None:
+                        try:
+                            rows = self.long_image_rows(decoded(), width, max_width, scaled_height)
+                        except Exception as e:
+                            self.logger.log(f"错误：处理图片失败 {img_path}，原因：{e}\n")
+                    if rows is None:
+                        # 与原先的整张画布一致，读取失败的图片位置留黑
+                        rows = bytes(max_width * 3 * scaled_height)
                     try:
-                        with Image.open(img_path) as img:
-                            # 如果图片模式不是RGB，进行转换
-                            if img.mode != 'RGB':
-                                img = img.convert('RGB')
-                            
-                            # 调整图片大小
-                            if width != max_width:
-                                ratio = max_width / width
-                                new_height = int(height * ratio)
-                                img = img.resize((max_width, new_height), Image.LANCZOS)
-                                height = new_height
-                            
-                            # 粘贴到长图上
-                            long_image.paste(img, (0, y_offset))
-                            y_offset += height
-                            
-                            # 主动释放内存
-                            img = None
+                        with self.tracer.span('long.encode'):
+                            long_writer.write_rows(rows)
                     except Exception as e:
-                        self.logger.log(f"错误：处理图片失败 {img_path}，原因：{e}\n")
-                        continue
-
-            # 保存结果
-            long_image.save(output_long_image, format='PNG', optimize=True)
-            self.logger.log(f"✅ 长图已保存：{output_long_image}\n")
-            
-            # 清理内存
-            long_image = None
-
-        except Exception as e:
-            self.logger.log(f"❌ 长图生成失败：{output_long_image}，原因：{e}\n")
+                        long_writer.abort()
+                        long_writer = None
+                        long_layout = {}
+                        self.logger.log(f"❌ 长图生成失败：{output_base}，原因：{e}\n")
+                    rows = None
         finally:
-            # 确保清理所有可能的引用
-            import gc
-            gc.collect()
+            if prefetcher:
+                prefetcher.close()
+            cache.clear()
+
+        # 取消时丢弃未完成的输出（只删除临时文件，已有的正式文件不受影响）
+        if cancelled:
+            if pdf_writer is not None:
+                pdf_writer.abort()
+            if long_writer:
+                long_writer.abort()
+            for output_path in (output_pdf, output_base):
+                if output_path:
+                    self.logger.log(f"⚠️ 已取消，未生成：{output_path}\n")
+            return built
+
+        if pdf_enabled:
+            if pdf_writer is None:
+                self.logger.log(f"⚠️ 未找到图片，跳过生成：{output_pdf}\n")
+            else:
+                try:
+                    with self.tracer.span('pdf.write'):
+                        pdf_writer.close()
+                    self.logger.log(f"✅ PDF 已保存：{output_pdf}\n")
+                    if color_report.get('gray') or color_report.get('bilevel'):
+                        self.logger.log(f"  🎨 灰度页 {color_report.get('gray', 0)}，黑白页 {color_report.get('bilevel', 0)}，"
+                                        f"比直接嵌入原图节省 {color_report.get('saved', 0) / 1048576:.2f} MB\n")
+                    if pdf_writer.duplicate_pages:
+                        self.logger.log(f"  ♻️ 重复页 {pdf_writer.duplicate_pages} 页共享已嵌入的图像，"
+                                        f"节省 {pdf_writer.duplicate_bytes / 1048576:.2f} MB\n")
+                        report['duplicate_pages'] = report.get('duplicate_pages', 0) + pdf_writer.duplicate_pages
+                        report['duplicate_bytes'] = report.get('duplicate_bytes', 0) + pdf_writer.duplicate_bytes
+                    built.append('pdf')
+                except Exception as e:
+                    pdf_writer.abort()
+                    self.logger.log(f"❌ PDF 生成失败：{output_pdf}，原因：{e}\n")
+
+        if long_writer:
+            try:
+                with self.tracer.span('long.encode') as span:
+                    long_writer.close()
+                    span.set(bytes_out=sum(os.path.getsize(path) for path in long_writer.paths))
+                self.remove_long_image_outputs(output_base, long_writer.paths)
+                for path in long_writer.paths:
+                    self.logger.log(f"✅ 长图已保存：{path}\n")
+                built.append('long')
+            except Exception as e:
+                long_writer.abort()
+                self.logger.log(f"❌ 长图生成失败：{output_base}，原因：{e}\n")
+        return built
 
-    # 在文件开头添加全局变量
-    stop_processing_flag = False
+    # 图形界面中运行 process_folders 的线程
     processing_thread = None
 
     # 添加新的处理函数用于并行处理单个章节
+    # 是否需要生成由调度方根据构建清单决定，这里直接（重新）生成；返回日志文本与成功生成的输出类型
     def process_single_chapter(self, chapter_info):
+        built = []
+        report = {}
         try:
-            chapter_folder, pdf_output_folder, long_output_folder, generate_pdf, merge_to_long_image = chapter_info
-            chapter_name = os.path.basename(chapter_folder)
+            chapter_folder, pdf_output_folder, long_output_folder, generate_pdf, merge_to_long_image, pages = chapter_info
+            chapter_name = self.get_chapter_name(chapter_folder)
             result_message = f"  📂 处理章节：{chapter_name}\n"
+            # 扫描索引提供的页面文件名与尺寸
+            page_names = [page[0] for page in pages] if pages else None
+            page_sizes = [page[1:] for page in pages] if pages else None
             
-            image_files = self.get_images_in_folder(chapter_folder)
-            if not image_files:
-                return result_message + f"  ⚠️ 文件夹 {chapter_folder} 中未找到图片，跳过处理。\n"
-                
-            result_message += f"  找到图片数量：{len(image_files)}\n"
-
-            # 处理 PDF
-            if generate_pdf and pdf_output_folder:
-                output_pdf = os.path.join(pdf_output_folder, f"{chapter_name}.pdf")
-                if not os.path.exists(output_pdf):
-                    self.create_pdf_from_images(image_files, output_pdf)
-
-            # 处理长图
-            if merge_to_long_image and long_output_folder:
-                output_long_image = os.path.join(long_output_folder, f"{chapter_name}_long.png")
-                if not os.path.exists(output_long_image):
-                    self.create_long_image_from_images(image_files, output_long_image)
-
-            return result_message
+            with self.open_chapter(chapter_folder, page_names) as image_files:
+                if not image_files:
+                    return {'message': result_message + f"  ⚠️ 文件夹 {chapter_folder} 中未找到图片，跳过处理。\n",
+                            'built': built}
+                    
+                result_message += f"  找到图片数量：{len(image_files)}\n"
+
+                output_pdf = None
+                if generate_pdf and pdf_output_folder:
+                    output_pdf = os.path.join(pdf_output_folder, f"{chapter_name}.pdf")
+                output_base = None
+                if merge_to_long_image and long_output_folder:
+                    output_base = self.long_image_output_base(long_output_folder, chapter_name)
+
+                # PDF 与长图在同一次遍历中生成，每页只读取、解码一次
+                with self.tracer.span('chapter', chapter=chapter_name, pages=len(image_files)):
+                    built.extend(self.create_outputs_from_images(image_files, output_pdf, output_base, page_sizes, report))
+
+            return {'message': result_message, 'built': built, 'report': report}
         except Exception as e:
-            return f"  ❌ 处理章节 {os.path.basename(chapter_folder)} 时出错：{str(e)}\n"
-
+            return {'message': f"  ❌ 处理章节 {os.path.basename(chapter_folder)} 时出错：{str(e)}\n",
+                    'built': built}
+
+    # 规划漫画的合订本：章节 PDF 按自然顺序每 pdf_volume_size 个一卷，只返回需要（重新）生成的卷：
+    # {输出键: (输出键, 章节 PDF 列表（文件名、大小、修改时间）, 合订本路径, 章节 PDF 路径列表)}
+    def plan_volumes(self, comic_name, output_folder, manifest):
+        volume_size = self.config.get('pdf_volume_size') or 0
+        pdf_folder = os.path.join(output_folder, f"{comic_name}_pdf")
+        if volume_size <= 0 or not os.path.isdir(pdf_folder):
+            return {}
+        chapters = []
+        with os.scandir(pdf_folder) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith('.pdf') and entry.is_file():
+                    stat = entry.stat()
+                    chapters.append([entry.name, stat.st_size, stat.st_mtime_ns])
+        chapters = natsorted(chapters, key=lambda chapter: chapter[0])
+        volume_folder = os.path.join(output_folder, f"{comic_name}_volumes")
+        self.remove_stale_volumes(comic_name, volume_folder, -(-len(chapters) // volume_size), output_folder, manifest)
+        volumes = {}
+        for number, start in enumerate(range(0, len(chapters), volume_size), 1):
+            sources = chapters[start:start + volume_size]
+            volume_path = os.path.join(volume_folder, f"{comic_name}_{number:03d}.pdf")
+            output_key = os.path.relpath(volume_path, output_folder)
+            if manifest.needs_build(output_key, sources, self.output_options('volume'), os.path.exists(volume_path)):
+                volumes[output_key] = (output_key, sources, volume_path,
+                                       [os.path.join(pdf_folder, source[0]) for source in sources])
+        return volumes
+
+    # 删除编号超出当前卷数的合订本及其清单记录：每卷章节数变大或章节被删除后，旧的高编号卷不再对应任何章节
+    def remove_stale_volumes(self, comic_name, volume_folder, volume_count, output_folder, manifest):
+        prefix = f"{comic_name}_"
+
+        def is_stale(path):
+            stem, extension = os.path.splitext(os.path.basename(path))
+            number = stem[len(prefix):]
+            return (os.path.dirname(path) == volume_folder and extension.lower() == '.pdf'
+                    and stem.startswith(prefix) and number.isdigit() and int(number) > volume_count)
+
+        stale = {os.path.join(output_folder, output) for output in manifest.entries}
+        if os.path.isdir(volume_folder):
+            stale.update(os.path.join(volume_folder, file_name) for file_name in os.listdir(volume_folder))
+        for volume_path in natsorted(path for path in stale if is_stale(path)):
+            if os.path.exists(volume_path):
+                os.remove(volume_path)
+                self.logger.log(f"🗑️ 已删除多余的合订本：{volume_path}\n")
+            manifest.forget(os.path.relpath(volume_path, output_folder))
+
+    # 将章节 PDF 按顺序合并为合订本：直接复制各页的图像流，不重新解码；每章一个书签，
+    # 相同的页面（如各章重复的汉化组说明页）跨章节只嵌入一次。成功时返回 True
+    def build_volume(self, volume_path, chapter_paths):
+        os.makedirs(os.path.dirname(volume_path), exist_ok=True)
+        writer = PdfWriter(volume_path, deduplicate=self.config.get('pdf_deduplicate_pages'))
+        try:
+            with self.tracer.span('volume', chapters=len(chapter_paths)) as span:
+                for chapter_path in chapter_paths:
+                    if self.cancel_event.is_set():
+                        raise ProcessingCancelled()
+                    writer.add_outline(os.path.splitext(os.path.basename(chapter_path))[0])
+                    for page in PdfImageReader(chapter_path).pages():
+                        writer.add_image_page(*page)
+                writer.close()
+                if self.tracer.enabled:
+                    span.set(bytes_out=os.path.getsize(volume_path))
+        except ProcessingCancelled:
+            writer.abort()
+            raise
+        except Exception as e:
+            writer.abort()
+            self.logger.log(f"❌ 合订本生成失败：{volume_path}，原因：{e}\n")
+            return False
+        self.logger.log(f"📚 合订本已保存：{volume_path}（{len(chapter_paths)} 章，{len(writer.page_ids)} 页）\n")
+        if writer.duplicate_pages:
+            self.logger.log(f"  ♻️ 重复页 {writer.duplicate_pages} 页共享已嵌入的图像，"
+                            f"节省 {writer.duplicate_bytes / 1048576:.2f} MB\n")
+        return True
+
+    # 漫画的后续任务，在该漫画最后一个章节完成后触发：生成需要更新的合订本（volumes 由 plan_volumes 给出），
+    # 再压缩输出目录；返回成功生成的合订本输出键
+    def archive_comic(self, comic_name, comic_output_folder_pdf, comic_output_folder_long, volumes=None):
+        built = []
+        for output_key, _, volume_path, chapter_paths in (volumes or {}).values():
+            if self.build_volume(volume_path, chapter_paths):
+                built.append(output_key)
+        if comic_output_folder_pdf:
+            self.logger.log(f"🔄 开始压缩PDF目录：{comic_name}\n")
+            self.traced_zip_folder(comic_output_folder_pdf, f"{comic_name}_pdf")
+        if comic_output_folder_long:
+            self.logger.log(f"🔄 开始压缩长图目录：{comic_name}\n")
+            self.traced_zip_folder(comic_output_folder_long, f"{comic_name}_long")
+        return {'message': "", 'built': built}
+
+    def traced_zip_folder(self, folder_path, zip_name):
+        with self.tracer.span('zip', archive=zip_name) as span:
+            self.zip_folder(folder_path, zip_name)
+            if self.tracer.enabled:
+                zip_path = os.path.join(os.path.dirname(folder_path), f"{zip_name}.zip")
+                if os.path.exists(zip_path):
+                    span.set(bytes_out=os.path.getsize(zip_path))
+
+    # 通知进度
+    def update_progress(self, completed_tasks, total_tasks):
+        if self.progress_callback:
+            self.progress_callback(completed_tasks, total_tasks)
+
+    # 处理整个输入目录，返回处理结果汇总：
+    # {'total': 任务数, 'completed': 已完成任务数, 'failed': 失败章节数, 'cancelled': 是否被取消, 'error': 致命错误信息或 None}
     def process_folders(self, base_folder, output_folder, generate_pdf, merge_to_long_image):
-        global stop_processing_flag
-        stop_processing_flag = False
+        self.cancel_event.clear()
+        summary = {'total': 0, 'completed': 0, 'failed': 0, 'cancelled': False, 'error': None}
+        try:
+            summary = self.convert_folders(base_folder, output_folder, generate_pdf, merge_to_long_image)
+        finally:
+            if self.finished_callback:
+                self.finished_callback(summary)
+        return summary
+
+    # 监视模式：先完整处理一遍输入目录，之后持续监视，新增或修改的漫画在变化静置后只处理这些漫画，
+    # 直到被取消。返回各批次累计的处理结果汇总，格式与 process_folders 相同
+    def watch_folders(self, base_folder, output_folder, generate_pdf, merge_to_long_image):
+        self.cancel_event.clear()
+        totals = {'total': 0, 'completed': 0, 'failed': 0, 'cancelled': False, 'error': None}
+        watcher = FolderWatcher(
+            base_folder,
+            settle_seconds=self.config.get('watch_settle_seconds'),
+            poll_interval=self.config.get('watch_poll_interval'),
+            max_pending=self.config.get('watch_max_pending'),
+            ignore_folder=output_folder
+        )
+        try:
+            # 先启动监视，完整处理期间到达的上传也会被记录
+            watcher.start()
+            self.logger.log(f"👀 监视模式已启动（{watcher.backend}）：{base_folder}\n")
+            comic_names = None
+            while not self.cancel_event.is_set():
+                if comic_names is None:
+                    self.logger.log("🔄 处理整个输入目录\n")
+                else:
+                    self.logger.log(f"🔄 检测到变化的漫画：{'、'.join(comic_names)}\n")
+                summary = self.convert_folders(base_folder, output_folder, generate_pdf, merge_to_long_image, comic_names)
+                for key in ('total', 'completed', 'failed'):
+                    totals[key] += summary[key]
+                totals['error'] = summary['error'] or totals['error']
+                self.logger.log("👀 等待新的变化...\n")
+                comic_names = watcher.wait_settled(self.cancel_event)
+            totals['cancelled'] = True
+        except Exception as e:
+            self.logger.log(f"❌ 监视模式出现错误：{str(e)}\n")
+            totals['error'] = str(e)
+        finally:
+            watcher.stop()
+            if self.finished_callback:
+                self.finished_callback(totals)
+        return totals
+
+    # 处理输入目录中的漫画（comic_names 为 None 时处理全部，否则只处理列出的漫画），返回处理结果汇总
+    def convert_folders(self, base_folder, output_folder, generate_pdf, merge_to_long_image, comic_names=None):
+        archive_executor = None
+        manifest = None
+        journal = None
+        summary = {'total': 0, 'completed': 0, 'failed': 0, 'cancelled': False, 'error': None}
         
         try:
             if not os.path.exists(output_folder):
@@ -286,152 +2494,320 @@ class FileProcessor:
                 self.logger.log(f"输出文件夹不存在，已创建：{output_folder}\n")
 
             self.logger.log(f"开始处理根目录：{base_folder}\n")
-            comic_folders = [
-                os.path.join(base_folder, folder)
-                for folder in os.listdir(base_folder)
-                if os.path.isdir(os.path.join(base_folder, folder))
-            ]
+            self.tracer.take_events()
+            with self.tracer.span('scan'):
+                if self.config.get('use_library_index'):
+                    # 一次遍历整个输入目录，未变化的子目录直接复用上次保存的索引；指定了漫画时这些漫画总是重新扫描
+                    index = LibraryIndex(output_folder)
+                    index.scan(base_folder, self.cancel_event, comic_names or ())
+                    index.save()
+                    self.logger.log(f"目录索引：复用 {index.reused} 个，重新扫描 {index.scanned} 个\n")
+                    comic_folders = index.comic_folders()
+                else:
+                    index = None
+                    comic_folders = [
+                        os.path.join(base_folder, folder)
+                        for folder in os.listdir(base_folder)
+                        if os.path.isdir(os.path.join(base_folder, folder))
+                    ]
+            if comic_names is not None:
+                comic_folders = [folder for folder in comic_folders if os.path.basename(folder) in comic_names]
             self.logger.log(f"发现漫画数量：{len(comic_folders)}\n")
+            manifest = BuildManifest(output_folder)
+            journal = JobJournal(output_folder)
+            # 补录上次运行中已完成、但在程序退出前尚未提交到构建清单的输出
+            for output_key, sources, options in journal.outputs:
+                manifest.record(output_key, sources, options)
+            manifest.commit()
+            journal.open()
+
+            # 汇总所有漫画中需要处理的章节，放入同一个全局队列
+            chapter_jobs = []
+            pending_chapters = {}
+            comic_archives = {}
+            memory_budget = int(self.config.get('memory_budget_mb') or 0) * 1048576
+            with self.tracer.span('plan'):
+                for comic_folder in comic_folders:
+                    comic_name = os.path.basename(comic_folder)
+                    # 为PDF和长图分别创建输出文件夹
+                    comic_output_folder_pdf = os.path.join(output_folder, f"{comic_name}_pdf") if generate_pdf else None
+                    comic_output_folder_long = os.path.join(output_folder, f"{comic_name}_long") if merge_to_long_image else None
+
+                    need_process_pdf = False
+                    need_process_long = False
+                    comic_jobs = []
+                    chapter_paths = index.chapter_paths(comic_folder) if index else self.get_chapter_paths(comic_folder)
+                    for chapter_folder in chapter_paths:
+                        if self.cancel_event.is_set():
+                            raise ProcessingCancelled()
+                        sources = self.scan_chapter_sources(chapter_folder, index)
+                        if not sources:
+                            continue
+                        chapter_name = self.get_chapter_name(chapter_folder)
+                        # 根据构建清单判断源图片或转换选项是否发生变化
+                        manifest_records = {}
+                        if generate_pdf:
+                            output_pdf = os.path.join(comic_output_folder_pdf, f"{chapter_name}.pdf")
+                            output_key = os.path.relpath(output_pdf, output_folder)
+                            if manifest.needs_build(output_key, sources, self.output_options('pdf'),
+                                                    os.path.exists(output_pdf)):
+                                manifest_records['pdf'] = (output_key, sources)
+                        if merge_to_long_image:
+                            output_base = self.long_image_output_base(comic_output_folder_long, chapter_name)
+                            output_key = os.path.relpath(output_base, output_folder)
+                            if manifest.needs_build(output_key, sources, self.output_options('long'),
+                                                    self.long_image_exists(comic_output_folder_long, chapter_name)):
+                                manifest_records['long'] = (output_key, sources)
+                        if not manifest_records:
+                            continue
+
+                        need_pdf = 'pdf' in manifest_records
+                        need_long = 'long' in manifest_records
+                        need_process_pdf = need_process_pdf or need_pdf
+                        need_process_long = need_process_long or need_long
+                        memory = 0
+                        if memory_budget:
+                            dimensions = ([page[3:6] for page in index.pages(chapter_folder)] if index
+                                          else self.probe_chapter(chapter_folder))
+                            memory = self.estimate_chapter_memory(dimensions, need_pdf, need_long)
+                        comic_jobs.append((len(sources), comic_name, (
+                            chapter_folder,
+                            comic_output_folder_pdf if need_pdf else None,
+                            comic_output_folder_long if need_long else None,
+                            need_pdf,
+                            need_long,
+                            [[page[0], page[3], page[4]] for page in index.pages(chapter_folder)] if index else None
+                        ), manifest_records, memory))
+
+                    if not comic_jobs:
+                        pending_archive = journal.pending_archive(comic_name)
+                        if pending_archive:
+                            self.logger.log(f"📂 漫画 {comic_name} 已完全处理，继续上次未完成的压缩。\n")
+                            pending_chapters[comic_name] = 0
+                            comic_archives[comic_name] = pending_archive
+                        elif generate_pdf and self.plan_volumes(comic_name, output_folder, manifest):
+                            self.logger.log(f"📂 漫画 {comic_name} 已完全处理，更新合订本。\n")
+                            pending_chapters[comic_name] = 0
+                            comic_archives[comic_name] = (None, None)
+                        else:
+                            self.logger.log(f"📂 漫画 {comic_name} 已完全处理，跳过。\n")
+                        continue
 
-            # 创建线程池，根据CPU核心数设置线程数
-            max_workers = self.config.get('max_workers')
-            self.executor = ThreadPoolExecutor(max_workers=max_workers)
-            
-            total_tasks = sum(len(self.get_subfolders(comic_folder)) + 1 for comic_folder in comic_folders)
-            if self.progress_bar:
-                self.progress_bar['maximum'] = total_tasks
-                self.progress_bar['value'] = 0
+                    # 创建所需的输出文件夹，并清理上次中途退出时留下的临时文件
+                    if need_process_pdf:
+                        os.makedirs(comic_output_folder_pdf, exist_ok=True)
+                        self.remove_temp_files(comic_output_folder_pdf)
+                    if need_process_long:
+                        os.makedirs(comic_output_folder_long, exist_ok=True)
+                        self.remove_temp_files(comic_output_folder_long)
+
+                    chapter_jobs.extend(comic_jobs)
+                    pending_chapters[comic_name] = len(comic_jobs)
+                    # 只压缩本次有章节更新的输出目录（以及上次未完成压缩的目录）
+                    comic_archives[comic_name] = journal.plan_archive(
+                        comic_name,
+                        comic_output_folder_pdf if need_process_pdf else None,
+                        comic_output_folder_long if need_process_long else None)
+            # 输入目录中已不存在的漫画不再补做压缩（只处理部分漫画时无法判断，保留记录）
+            if comic_names is None:
+                for comic_name in list(journal.pending_archives):
+                    if comic_name not in comic_archives:
+                        journal.record_archive(comic_name)
+            manifest.commit()
+
+            # 页数多的章节优先调度，避免大章节最后才开始而拖长整体耗时
+            chapter_jobs.sort(key=lambda job: job[0], reverse=True)
+            self.logger.log(f"待处理章节数量：{len(chapter_jobs)}\n")
+            if memory_budget and chapter_jobs:
+                largest = max(chapter_jobs, key=lambda job: job[4])
+                self.logger.log(f"内存预算：{memory_budget / 1048576:.0f} MB，"
+                                f"估算占用最大的章节：{os.path.basename(largest[2][0])}（{largest[4] / 1048576:.0f} MB）\n")
+                oversized = sum(1 for job in chapter_jobs if job[4] > memory_budget)
+                if oversized:
+                    self.logger.log(f"⚠️ {oversized} 个章节的估算内存超过预算，将在没有其他章节运行时单独处理\n")
+
+            total_tasks = len(chapter_jobs) + len(comic_archives)
+            summary['total'] = total_tasks
             completed_tasks = 0
+            self.update_progress(completed_tasks, total_tasks)
 
-            for comic_folder in comic_folders:
-                if stop_processing_flag:
-                    self.logger.log("⚠️ 用户取消处理\n")
-                    if self.executor:
-                        self.executor.shutdown(wait=False)
-                    break
-
-                comic_name = os.path.basename(comic_folder)
-                # 为PDF和长图分别创建输出文件夹
-                comic_output_folder_pdf = os.path.join(output_folder, f"{comic_name}_pdf") if generate_pdf else None
-                comic_output_folder_long = os.path.join(output_folder, f"{comic_name}_long") if merge_to_long_image else None
-
-                # 检查是否需要处理
-                need_process_pdf = False
-                need_process_long = False
-                if generate_pdf or merge_to_long_image:
-                    for chapter_folder in self.get_subfolders(comic_folder) + [comic_folder]:
-                        chapter_name = os.path.basename(chapter_folder)
-                        if generate_pdf and (not comic_output_folder_pdf or 
-                            not os.path.exists(os.path.join(comic_output_folder_pdf, f"{chapter_name}.pdf"))):
-                            need_process_pdf = True
-                        if merge_to_long_image and (not comic_output_folder_long or 
-                            not os.path.exists(os.path.join(comic_output_folder_long, f"{chapter_name}_long.png"))):
-                            need_process_long = True
-                        if need_process_pdf and need_process_long:
-                            break
-
-                if not need_process_pdf and not need_process_long:
-                    self.logger.log(f"📂 漫画 {comic_name} 已完全处理，跳过。\n")
-                    if self.progress_bar and self.progress_label and self.gui_root:
-                        self.progress_bar['value'] += len(self.get_subfolders(comic_folder)) + 1
-                        self.gui_root.update_idletasks()
-                    continue
-
-                # 创建所需的输出文件夹
-                if generate_pdf and need_process_pdf:
-                    os.makedirs(comic_output_folder_pdf, exist_ok=True)
-                if merge_to_long_image and need_process_long:
-                    os.makedirs(comic_output_folder_long, exist_ok=True)
-
-                self.logger.log(f"\n📚 正在处理漫画：{comic_name}\n")
-                chapter_folders = self.get_subfolders(comic_folder)
-                chapter_folders.insert(0, comic_folder)
-
-                # 并行处理章节
-                try:
-                    # 创建任务列表和跟踪字典
-                    futures = []
-                    future_to_chapter = {}
-                    for chapter_folder in chapter_folders:
-                        if self.stop_flag:
-                            break
-                        future = self.executor.submit(
-                            self.process_single_chapter,
-                            (chapter_folder, 
-                             comic_output_folder_pdf if generate_pdf else None,
-                             comic_output_folder_long if merge_to_long_image else None,
-                             generate_pdf, 
-                             merge_to_long_image)
-                        )
-                        futures.append(future)
-                        future_to_chapter[future] = chapter_folder
-
-                    # 处理完成的任务结果
-                    for future in as_completed(futures):
-                        if self.stop_flag:
-                            for f in futures:
-                                f.cancel()
-                            break
-                        chapter_folder = future_to_chapter[future]
-                        try:
-                            result = future.result()
-                            self.logger.log(result)
-                        except Exception as e:
-                            self.logger.log(f"  ❌ 处理失败 {os.path.basename(chapter_folder)}：{str(e)}\n")
-                        
-                        completed_tasks += 1
-                        if self.progress_bar and self.progress_label and self.gui_root:
-                            self.progress_bar['value'] = completed_tasks
-                            self.progress_label.config(text=f"{int((completed_tasks / total_tasks) * 100)}%")
-                            self.gui_root.update_idletasks()
-
-                except Exception as e:
-                    self.logger.log(f"处理失败：{str(e)}\n")
-                    if self.stop_flag:
+            # 创建线程池或进程池，根据CPU核心数设置并行数
+            max_workers = self.config.get('max_workers')
+            if self.config.get('executor_backend') == 'process':
+                if sys.platform == 'win32':
+                    # Windows 下进程池最多支持 61 个工作进程
+                    max_workers = min(max_workers, 61)
+                # 子进程通过初始化函数继承取消标志
+                executor = ProcessPoolExecutor(max_workers=max_workers, initializer=init_chapter_worker,
+                                               initargs=(self.cancel_event,))
+                # 子进程只接收路径和配置值，返回日志文本，不在进程间传递图像对象
+                chapter_task = partial(process_chapter_in_subprocess, config_values=dict(self.config.config))
+            else:
+                executor = ThreadPoolExecutor(max_workers=max_workers)
+                chapter_task = self.process_single_chapter
+            self.executor = executor
+            # 压缩任务在独立的线程池中执行，不占用章节处理的并行槽位
+            archive_executor = ThreadPoolExecutor(max_workers=2)
+
+            # 在并行数与内存预算允许的范围内保持尽可能多的章节在处理中，某部漫画的章节全部完成后立即提交其压缩任务。
+            # 大章节的估算内存暂时放不下时，排在后面的小章节先行开始，不必等待大章节
+            waiting_jobs = chapter_jobs
+            running_chapters = 0
+            reserved_memory = 0
+            running = {}
+
+            # 提交漫画的后续任务；章节 PDF 此时已全部生成，据此规划需要更新的合订本
+            def submit_archive(comic_name):
+                volumes = self.plan_volumes(comic_name, output_folder, manifest) if generate_pdf else {}
+                archive_future = archive_executor.submit(self.archive_comic, comic_name, *comic_archives[comic_name], volumes)
+                running[archive_future] = ('archive', comic_name, comic_name, volumes, 0)
+
+            # 没有章节需要处理、只需补做压缩或更新合订本的漫画直接提交后续任务
+            for comic_name, pending in pending_chapters.items():
+                if pending == 0:
+                    submit_archive(comic_name)
+            cancel_logged = False
+            run_report = {}
+            # 本次至少有一个章节成功生成输出的漫画；章节全部失败的漫画不压缩，避免打包空文件夹
+            comics_with_output = set()
+            while waiting_jobs or running:
+                # 取消后不再提交新任务；处理中的章节会在当前页完成后停止并清理未完成的输出，等待它们结束
+                if self.cancel_event.is_set() and not cancel_logged:
+                    self.logger.log("⚠️ 用户取消处理，等待处理中的任务停止...\n")
+                    cancel_logged = True
+                    waiting_jobs = []
+                    for future in running:
+                        future.cancel()
+                    running = {future: task for future, task in running.items() if not future.cancelled()}
+                    if not running:
                         break
 
-                if not stop_processing_flag:
-                    # 分别为PDF和长图版本创建ZIP
-                    if generate_pdf and need_process_pdf:
-                        self.logger.log(f"🔄 开始压缩PDF目录：{comic_name}\n")
-                        self.zip_folder(comic_output_folder_pdf, f"{comic_name}_pdf")
-                    if merge_to_long_image and need_process_long:
-                        self.logger.log(f"🔄 开始压缩长图目录：{comic_name}\n")
-                        self.zip_folder(comic_output_folder_long, f"{comic_name}_long")
-
-                completed_tasks += 1
-                if self.progress_bar and self.progress_label and self.gui_root:
-                    self.progress_bar['value'] = completed_tasks
-                    self.progress_label.config(text=f"{int((completed_tasks / total_tasks) * 100)}%")
-                    self.gui_root.update_idletasks()
-
-            if not stop_processing_flag:
+                deferred_jobs = []
+                for job in waiting_jobs:
+                    _, comic_name, chapter_info, manifest_records, memory = job
+                    # 超过预算的章节只在没有其他章节运行时开始
+                    if running_chapters >= max_workers or (
+                            memory_budget and running_chapters and reserved_memory + memory > memory_budget):
+                        deferred_jobs.append(job)
+                        continue
+                    future = executor.submit(chapter_task, chapter_info)
+                    running[future] = ('chapter', comic_name, chapter_info[0], manifest_records, memory)
+                    running_chapters += 1
+                    reserved_memory += memory
+                waiting_jobs = deferred_jobs
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, comic_name, label, manifest_records, memory = running.pop(future)
+                    try:
+                        result = future.result()
+                        self.logger.log(result['message'])
+                        # 进程池中记录的阶段耗时随结果返回
+                        self.tracer.extend(result.get('trace', ()))
+                        for key, value in result.get('report', {}).items():
+                            run_report[key] = run_report.get(key, 0) + value
+                        # 只有成功生成的输出才记入构建清单，失败的章节下次运行时会重试
+                        for output_kind in result['built']:
+                            output_key, sources = manifest_records[output_kind][:2]
+                            options = self.output_options('volume' if kind == 'archive' else output_kind)
+                            manifest.record(output_key, sources, options)
+                            journal.record_output(output_key, sources, options)
+                        if kind == 'archive':
+                            journal.record_archive(comic_name)
+                        elif result['built']:
+                            comics_with_output.add(comic_name)
+                        if kind == 'chapter' and set(result['built']) != set(manifest_records) and not self.cancel_event.is_set():
+                            summary['failed'] += 1
+                    except ProcessingCancelled:
+                        self.logger.log(f"⚠️ 已取消：{os.path.basename(label)}\n")
+                    except Exception as e:
+                        self.logger.log(f"  ❌ 处理失败 {os.path.basename(label)}：{str(e)}\n")
+                        if kind == 'chapter':
+                            summary['failed'] += 1
+
+                    if kind == 'chapter':
+                        running_chapters -= 1
+                        reserved_memory -= memory
+                        pending_chapters[comic_name] -= 1
+                        if pending_chapters[comic_name] == 0 and not self.cancel_event.is_set():
+                            if comic_name in comics_with_output:
+                                submit_archive(comic_name)
+                            else:
+                                # 压缩任务保留在任务日志中，章节下次重试成功后再压缩
+                                self.logger.log(f"⚠️ 漫画 {comic_name} 没有成功生成任何输出，跳过压缩。\n")
+                                completed_tasks += 1
+
+                    completed_tasks += 1
+                    summary['completed'] = completed_tasks
+                    self.update_progress(completed_tasks, total_tasks)
+
+            if self.tracer.enabled:
+                trace_path = os.path.join(output_folder, 'comic-to-pdf-trace.json')
+                self.tracer.save_chrome_trace(trace_path)
+                self.logger.log(f"⏱️ 阶段耗时统计（跟踪文件：{trace_path}，可在 chrome://tracing 或 Perfetto 中打开）：\n"
+                                + self.tracer.summary())
+
+            if run_report.get('duplicate_pages') or run_report.get('near_duplicates'):
+                self.logger.log(f"♻️ 重复页合计 {run_report.get('duplicate_pages', 0)} 页，"
+                                f"节省 {run_report.get('duplicate_bytes', 0) / 1048576:.2f} MB；"
+                                f"近似重复页 {run_report.get('near_duplicates', 0)} 页\n")
+
+            if self.cancel_event.is_set():
+                summary['cancelled'] = True
+            elif summary['failed']:
+                self.logger.log(f"⚠️ 处理结束，{summary['failed']} 个章节失败，下次运行时会重试。\n")
+            else:
                 self.logger.log("🎉 所有漫画处理完成！\n")
-                if self.progress_bar and self.progress_label:
-                    self.progress_bar['value'] = self.progress_bar['maximum']
-                    self.progress_label.config(text="100%")
-                messagebox.showinfo("完成", "所有漫画已处理完成！")
 
+        except ProcessingCancelled:
+            # 扫描或规划阶段被取消
+            self.logger.log("⚠️ 用户取消处理\n")
+            summary['cancelled'] = True
         except Exception as e:
             self.logger.log(f"❌ 处理过程出现错误：{str(e)}\n")
+            summary['error'] = str(e)
         finally:
             # 确保线程池被正确关闭
             if self.executor:
                 self.executor.shutdown(wait=False)
             self.executor = None
-            if self.gui_root and self.start_button and self.stop_button:
-                self.gui_root.after(0, lambda: self.start_button.config(state=tk.NORMAL))
-                self.gui_root.after(0, lambda: self.stop_button.config(state=tk.DISABLED))
-
+            if archive_executor:
+                archive_executor.shutdown(wait=False)
+            if manifest:
+                manifest.close()
+            if journal:
+                journal.close()
+        return summary
+
+    # 请求取消，可从任意线程调用；process_folders 在处理中的章节停止后返回
     def stop_processing(self):
-        """改进的停止处理方法"""
-        self.stop_flag = True
-        if self.executor:
-            self.executor.shutdown(wait=False)
-        self.executor = None
+        self.cancel_event.set()
+
+# 进程池子进程共享的取消标志，由 init_chapter_worker 在子进程启动时设置
+worker_cancel_event = None
+
+# 进程池的初始化函数：保存主进程传入的取消标志，并忽略 Ctrl+C（由主进程通过取消标志统一停止）
+def init_chapter_worker(cancel_event):
+    global worker_cancel_event
+    worker_cancel_event = cancel_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+# 进程池的工作函数：在子进程中重建处理器处理单个章节，返回该章节的日志文本与结果
+def process_chapter_in_subprocess(chapter_info, config_values):
+    logger = BufferedLogger()
+    processor = FileProcessor(Config.from_values(config_values), logger, cancel_event=worker_cancel_event)
+    result = processor.process_single_chapter(chapter_info)
+    # 章节标题在前，处理过程中记录的日志（已保存的输出、跳过的图片等）在后
+    result['message'] = result['message'] + logger.getvalue()
+    result['trace'] = processor.tracer.take_events()
+    return result
 
 class GUI:
     """GUI管理类"""
+    # 事件刷新间隔（毫秒）与每次最多处理的事件数
+    EVENT_INTERVAL_MS = 50
+    MAX_EVENTS_PER_FRAME = 2000
+
     def __init__(self):
         self.root = tk.Tk()
         self.config = Config()
@@ -439,18 +2815,16 @@ class GUI:
         # 初始化所有界面组件
         self.init_gui()
         
-        # 创建日志实例
+        # 创建日志实例，并开始定时处理工作线程投递的事件
         self.logger = Logger(self.log_text, self.auto_scroll_var)
+        self.root.after(self.EVENT_INTERVAL_MS, self.drain_events)
         
         # 创建文件处理器实例
         self.file_processor = FileProcessor(
             self.config,
             self.logger,
-            progress_bar=self.progress_bar,
-            progress_label=self.progress_label,
-            gui_root=self.root,
-            start_button=self.start_button,
-            stop_button=self.stop_button
+            progress_callback=self.update_progress,
+            finished_callback=self.on_processing_finished
         )
         
         # 创建默认文件夹并更新输入输出路径
@@ -484,8 +2858,26 @@ class GUI:
     def init_variables(self):
         # 从配置中初始化所有变量
         self.max_workers_var = tk.IntVar(value=self.config.get('max_workers'))
+        self.executor_backend_var = tk.StringVar(value=self.config.get('executor_backend'))
+        self.prefetch_mb_var = tk.IntVar(value=self.config.get('prefetch_mb'))
+        self.memory_budget_mb_var = tk.IntVar(value=self.config.get('memory_budget_mb'))
         self.optimize_pdf_var = tk.BooleanVar(value=self.config.get('optimize_pdf'))
         self.image_quality_var = tk.IntVar(value=self.config.get('image_quality'))
+        self.pdf_max_width_var = tk.IntVar(value=self.config.get('pdf_max_width'))
+        self.pdf_max_height_var = tk.IntVar(value=self.config.get('pdf_max_height'))
+        self.pdf_grayscale_detection_var = tk.BooleanVar(value=self.config.get('pdf_grayscale_detection'))
+        self.pdf_grayscale_tolerance_var = tk.IntVar(value=self.config.get('pdf_grayscale_tolerance'))
+        self.pdf_deduplicate_pages_var = tk.BooleanVar(value=self.config.get('pdf_deduplicate_pages'))
+        self.pdf_volume_size_var = tk.IntVar(value=self.config.get('pdf_volume_size'))
+        self.pdf_near_duplicates_var = tk.StringVar(value=self.config.get('pdf_near_duplicates'))
+        self.pdf_near_duplicate_distance_var = tk.IntVar(value=self.config.get('pdf_near_duplicate_distance'))
+        self.long_image_format_var = tk.StringVar(value=self.config.get('long_image_format'))
+        self.long_image_compress_level_var = tk.IntVar(value=self.config.get('long_image_compress_level'))
+        self.long_image_quality_var = tk.IntVar(value=self.config.get('long_image_quality'))
+        self.long_image_max_height_var = tk.IntVar(value=self.config.get('long_image_max_height'))
+        self.archive_compression_var = tk.StringVar(value=self.config.get('archive_compression'))
+        self.archive_compress_level_var = tk.IntVar(value=self.config.get('archive_compress_level'))
+        self.archive_workers_var = tk.IntVar(value=self.config.get('archive_workers'))
         self.generate_pdf_var = tk.BooleanVar(value=self.config.get('generate_pdf'))
         self.merge_to_long_image_var = tk.BooleanVar(value=self.config.get('merge_to_long_image'))
         self.auto_scroll_var = tk.BooleanVar(value=self.config.get('auto_scroll'))
@@ -587,6 +2979,11 @@ class GUI:
         self.merge_to_long_image_var = tk.BooleanVar(value=False)  # 修复：将 value() 改为 value=
         merge_to_long_image_checkbox = tk.Checkbutton(main_frame, text="合并为长图", variable=self.merge_to_long_image_var)
         merge_to_long_image_checkbox.grid(row=7, column=0, columnspan=5, pady=5, sticky="w")
+
+        self.watch_mode_var = tk.BooleanVar(value=False)
+        watch_mode_checkbox = tk.Checkbutton(main_frame, text="持续监视输入文件夹，自动处理新增章节（点击停止处理结束）",
+                                             variable=self.watch_mode_var)
+        watch_mode_checkbox.grid(row=8, column=0, columnspan=5, pady=5, sticky="w")
         
     def create_settings_tab(self, notebook):
         settings_frame = ttk.Frame(notebook)
@@ -600,11 +2997,42 @@ class GUI:
         max_workers_spin = ttk.Spinbox(
             parallel_frame, 
             from_=1, 
-            to=16, 
+            to=max(64, (os.cpu_count() or 4) * 2), 
             width=5, 
             textvariable=self.max_workers_var
         )
         max_workers_spin.pack(side="left", padx=5)
+
+        ttk.Label(parallel_frame, text="执行方式:").pack(side="left", padx=5)
+        backend_combo = ttk.Combobox(
+            parallel_frame,
+            values=('thread', 'process'),
+            width=8,
+            state="readonly",
+            textvariable=self.executor_backend_var
+        )
+        backend_combo.pack(side="left", padx=5)
+        ttk.Label(parallel_frame, text="（process 为多进程，适合多核 CPU）").pack(side="left", padx=5)
+
+        ttk.Label(parallel_frame, text="预读(MB):").pack(side="left", padx=5)
+        ttk.Spinbox(
+            parallel_frame,
+            from_=0,
+            to=4096,
+            increment=16,
+            width=6,
+            textvariable=self.prefetch_mb_var
+        ).pack(side="left", padx=5)
+
+        ttk.Label(parallel_frame, text="内存预算(MB):").pack(side="left", padx=5)
+        ttk.Spinbox(
+            parallel_frame,
+            from_=0,
+            to=1048576,
+            increment=512,
+            width=8,
+            textvariable=self.memory_budget_mb_var
+        ).pack(side="left", padx=5)
         
         # PDF设置
         pdf_frame = ttk.LabelFrame(settings_frame, text="PDF设置")
@@ -615,6 +3043,80 @@ class GUI:
             text="优化PDF大小（可能降低质量）", 
             variable=self.optimize_pdf_var
         ).pack(padx=5, pady=2)
+
+        pdf_size_frame = ttk.Frame(pdf_frame)
+        pdf_size_frame.pack(padx=5, pady=2)
+        ttk.Label(pdf_size_frame, text="页面最大宽度:").pack(side="left", padx=5)
+        ttk.Spinbox(
+            pdf_size_frame,
+            from_=0,
+            to=20000,
+            increment=100,
+            width=7,
+            textvariable=self.pdf_max_width_var
+        ).pack(side="left", padx=5)
+        ttk.Label(pdf_size_frame, text="最大高度:").pack(side="left", padx=5)
+        ttk.Spinbox(
+            pdf_size_frame,
+            from_=0,
+            to=20000,
+            increment=100,
+            width=7,
+            textvariable=self.pdf_max_height_var
+        ).pack(side="left", padx=5)
+        ttk.Label(pdf_size_frame, text="（像素，0为不缩小）").pack(side="left", padx=5)
+
+        pdf_color_frame = ttk.Frame(pdf_frame)
+        pdf_color_frame.pack(padx=5, pady=2)
+        ttk.Checkbutton(
+            pdf_color_frame,
+            text="灰度/黑白页面自动以灰度或 1 位写入",
+            variable=self.pdf_grayscale_detection_var
+        ).pack(side="left", padx=5)
+        ttk.Label(pdf_color_frame, text="颜色容差(0-255):").pack(side="left", padx=5)
+        ttk.Spinbox(
+            pdf_color_frame,
+            from_=0,
+            to=255,
+            width=5,
+            textvariable=self.pdf_grayscale_tolerance_var
+        ).pack(side="left", padx=5)
+
+        pdf_volume_frame = ttk.Frame(pdf_frame)
+        pdf_volume_frame.pack(padx=5, pady=2)
+        ttk.Label(pdf_volume_frame, text="合订本每卷章节数:").pack(side="left", padx=5)
+        ttk.Spinbox(
+            pdf_volume_frame,
+            from_=0,
+            to=9999,
+            width=6,
+            textvariable=self.pdf_volume_size_var
+        ).pack(side="left", padx=5)
+        ttk.Label(pdf_volume_frame, text="（0为不生成，合订本带章节书签，不重新编码图片）").pack(side="left", padx=5)
+
+        pdf_duplicate_frame = ttk.Frame(pdf_frame)
+        pdf_duplicate_frame.pack(padx=5, pady=2)
+        ttk.Checkbutton(
+            pdf_duplicate_frame,
+            text="相同页面只嵌入一次",
+            variable=self.pdf_deduplicate_pages_var
+        ).pack(side="left", padx=5)
+        ttk.Label(pdf_duplicate_frame, text="近似重复页:").pack(side="left", padx=5)
+        ttk.Combobox(
+            pdf_duplicate_frame,
+            textvariable=self.pdf_near_duplicates_var,
+            values=('off', 'report', 'skip'),
+            state="readonly",
+            width=7
+        ).pack(side="left", padx=5)
+        ttk.Label(pdf_duplicate_frame, text="差异阈值(0-128):").pack(side="left", padx=5)
+        ttk.Spinbox(
+            pdf_duplicate_frame,
+            from_=0,
+            to=128,
+            width=5,
+            textvariable=self.pdf_near_duplicate_distance_var
+        ).pack(side="left", padx=5)
         
         # 图像设置
         image_frame = ttk.LabelFrame(settings_frame, text="图像设置")
@@ -629,6 +3131,80 @@ class GUI:
             textvariable=self.image_quality_var
         )
         quality_spin.pack(side="left", padx=5)
+
+        # 长图设置
+        long_image_frame = ttk.LabelFrame(settings_frame, text="长图设置")
+        long_image_frame.pack(fill="x", padx=5, pady=5)
+
+        ttk.Label(long_image_frame, text="格式:").grid(row=0, column=0, padx=5, pady=2, sticky="w")
+        ttk.Combobox(
+            long_image_frame,
+            values=('png', 'webp', 'webp_lossless', 'jpeg'),
+            width=12,
+            state="readonly",
+            textvariable=self.long_image_format_var
+        ).grid(row=0, column=1, padx=5, pady=2, sticky="w")
+
+        ttk.Label(long_image_frame, text="PNG压缩级别(0-9):").grid(row=0, column=2, padx=5, pady=2, sticky="w")
+        ttk.Spinbox(
+            long_image_frame,
+            from_=0,
+            to=9,
+            width=5,
+            textvariable=self.long_image_compress_level_var
+        ).grid(row=0, column=3, padx=5, pady=2, sticky="w")
+
+        ttk.Label(long_image_frame, text="WebP/JPEG质量(1-100):").grid(row=1, column=0, padx=5, pady=2, sticky="w")
+        ttk.Spinbox(
+            long_image_frame,
+            from_=1,
+            to=100,
+            width=5,
+            textvariable=self.long_image_quality_var
+        ).grid(row=1, column=1, padx=5, pady=2, sticky="w")
+
+        ttk.Label(long_image_frame, text="分段最大高度(0为不限):").grid(row=1, column=2, padx=5, pady=2, sticky="w")
+        ttk.Spinbox(
+            long_image_frame,
+            from_=0,
+            to=65535,
+            increment=1000,
+            width=7,
+            textvariable=self.long_image_max_height_var
+        ).grid(row=1, column=3, padx=5, pady=2, sticky="w")
+
+        # 压缩包设置
+        archive_frame = ttk.LabelFrame(settings_frame, text="压缩包设置")
+        archive_frame.pack(fill="x", padx=5, pady=5)
+
+        ttk.Label(archive_frame, text="压缩方式:").grid(row=0, column=0, padx=5, pady=2, sticky="w")
+        ttk.Combobox(
+            archive_frame,
+            values=tuple(ZipArchiveWriter.COMPRESSIONS),
+            width=10,
+            state="readonly",
+            textvariable=self.archive_compression_var
+        ).grid(row=0, column=1, padx=5, pady=2, sticky="w")
+
+        ttk.Label(archive_frame, text="压缩级别(0-9):").grid(row=0, column=2, padx=5, pady=2, sticky="w")
+        ttk.Spinbox(
+            archive_frame,
+            from_=0,
+            to=9,
+            width=5,
+            textvariable=self.archive_compress_level_var
+        ).grid(row=0, column=3, padx=5, pady=2, sticky="w")
+
+        ttk.Label(archive_frame, text="压缩线程数:").grid(row=1, column=0, padx=5, pady=2, sticky="w")
+        ttk.Spinbox(
+            archive_frame,
+            from_=1,
+            to=max(64, (os.cpu_count() or 4) * 2),
+            width=5,
+            textvariable=self.archive_workers_var
+        ).grid(row=1, column=1, padx=5, pady=2, sticky="w")
+        ttk.Label(archive_frame, text="（压缩不了的文件如 JPEG 会自动改为直接存储）").grid(
+            row=1, column=2, columnspan=2, padx=5, pady=2, sticky="w")
         
     def create_about_tab(self, notebook):
         about_frame = ttk.Frame(notebook)
@@ -665,15 +3241,51 @@ class GUI:
         """绑定所有事件处理函数"""
         def on_setting_changed(*args):
             self.config.set('max_workers', self.max_workers_var.get())
+            self.config.set('executor_backend', self.executor_backend_var.get())
+            self.config.set('prefetch_mb', self.prefetch_mb_var.get())
+            self.config.set('memory_budget_mb', self.memory_budget_mb_var.get())
             self.config.set('optimize_pdf', self.optimize_pdf_var.get())
             self.config.set('image_quality', self.image_quality_var.get())
+            self.config.set('pdf_max_width', self.pdf_max_width_var.get())
+            self.config.set('pdf_max_height', self.pdf_max_height_var.get())
+            self.config.set('pdf_grayscale_detection', self.pdf_grayscale_detection_var.get())
+            self.config.set('pdf_grayscale_tolerance', self.pdf_grayscale_tolerance_var.get())
+            self.config.set('pdf_deduplicate_pages', self.pdf_deduplicate_pages_var.get())
+            self.config.set('pdf_volume_size', self.pdf_volume_size_var.get())
+            self.config.set('pdf_near_duplicates', self.pdf_near_duplicates_var.get())
+            self.config.set('pdf_near_duplicate_distance', self.pdf_near_duplicate_distance_var.get())
+            self.config.set('long_image_format', self.long_image_format_var.get())
+            self.config.set('long_image_compress_level', self.long_image_compress_level_var.get())
+            self.config.set('long_image_quality', self.long_image_quality_var.get())
+            self.config.set('long_image_max_height', self.long_image_max_height_var.get())
+            self.config.set('archive_compression', self.archive_compression_var.get())
+            self.config.set('archive_compress_level', self.archive_compress_level_var.get())
+            self.config.set('archive_workers', self.archive_workers_var.get())
             self.config.set('generate_pdf', self.generate_pdf_var.get())
             self.config.set('merge_to_long_image', self.merge_to_long_image_var.get())
             self.config.set('auto_scroll', self.auto_scroll_var.get())
 
         self.max_workers_var.trace_add('write', on_setting_changed)
+        self.executor_backend_var.trace_add('write', on_setting_changed)
+        self.prefetch_mb_var.trace_add('write', on_setting_changed)
+        self.memory_budget_mb_var.trace_add('write', on_setting_changed)
         self.optimize_pdf_var.trace_add('write', on_setting_changed)
         self.image_quality_var.trace_add('write', on_setting_changed)
+        self.pdf_max_width_var.trace_add('write', on_setting_changed)
+        self.pdf_max_height_var.trace_add('write', on_setting_changed)
+        self.pdf_grayscale_detection_var.trace_add('write', on_setting_changed)
+        self.pdf_grayscale_tolerance_var.trace_add('write', on_setting_changed)
+        self.pdf_deduplicate_pages_var.trace_add('write', on_setting_changed)
+        self.pdf_volume_size_var.trace_add('write', on_setting_changed)
+        self.pdf_near_duplicates_var.trace_add('write', on_setting_changed)
+        self.pdf_near_duplicate_distance_var.trace_add('write', on_setting_changed)
+        self.long_image_format_var.trace_add('write', on_setting_changed)
+        self.long_image_compress_level_var.trace_add('write', on_setting_changed)
+        self.long_image_quality_var.trace_add('write', on_setting_changed)
+        self.long_image_max_height_var.trace_add('write', on_setting_changed)
+        self.archive_compression_var.trace_add('write', on_setting_changed)
+        self.archive_compress_level_var.trace_add('write', on_setting_changed)
+        self.archive_workers_var.trace_add('write', on_setting_changed)
         self.generate_pdf_var.trace_add('write', on_setting_changed)
         self.merge_to_long_image_var.trace_add('write', on_setting_changed)
         self.auto_scroll_var.trace_add('write', on_setting_changed)
@@ -718,13 +3330,9 @@ class GUI:
         self.file_processor = FileProcessor(
             self.config,
             self.logger,
-            progress_bar=self.progress_bar,
-            progress_label=self.progress_label,
-            gui_root=self.root,
-            start_button=self.start_button,
-            stop_button=self.stop_button
+            progress_callback=self.update_progress,
+            finished_callback=self.on_processing_finished
         )
-        self.file_processor.stop_flag = False
         self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
         
@@ -733,23 +3341,64 @@ class GUI:
             self.file_processor.processing_thread.join(timeout=0.1)
         
         self.file_processor.processing_thread = threading.Thread(
-            target=self.file_processor.process_folders,
+            target=self.file_processor.watch_folders if self.watch_mode_var.get() else self.file_processor.process_folders,
             args=(base_folder, output_folder, generate_pdf, merge_to_long_image)
         )
         self.file_processor.processing_thread.daemon = True  # 设置为守护线程
         self.file_processor.processing_thread.start()
         
+    # 处理线程的回调只投递事件，控件在主线程的 drain_events 中更新
+    def update_progress(self, completed_tasks, total_tasks):
+        self.logger.post('progress', completed_tasks, total_tasks)
+
+    def on_processing_finished(self, summary):
+        self.logger.post('finished', summary)
+
+    # 批量处理事件：日志合并为一次写入，进度只显示最新的一次
+    def drain_events(self):
+        texts = []
+        progress = None
+        finished = None
+        for event in self.logger.take_events(self.MAX_EVENTS_PER_FRAME):
+            if event[0] == 'log':
+                texts.append(event[1])
+            elif event[0] == 'progress':
+                progress = event[1:]
+            elif event[0] == 'finished':
+                finished = event[1]
+        if texts:
+            self.logger.write(''.join(texts))
+        if progress:
+            self.show_progress(*progress)
+        if finished:
+            self.show_finished(finished)
+        self.root.after(self.EVENT_INTERVAL_MS, self.drain_events)
+
+    # 更新进度条与百分比
+    def show_progress(self, completed_tasks, total_tasks):
+        self.progress_bar['maximum'] = max(total_tasks, 1)
+        self.progress_bar['value'] = completed_tasks
+        self.progress_label.config(text=f"{int((completed_tasks / max(total_tasks, 1)) * 100)}%")
+
+    # 处理结束后恢复按钮状态，正常完成时弹窗提示
+    def show_finished(self, summary):
+        self.start_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+        if not summary['cancelled'] and not summary['error']:
+            self.progress_bar['value'] = self.progress_bar['maximum']
+            self.progress_label.config(text="100%")
+            messagebox.showinfo("完成", "所有漫画已处理完成！")
+
+    # 请求停止；开始按钮在处理线程真正结束（show_finished）后才恢复
     def stop_processing(self):
-        """改进的停止处理方法"""
         if self.file_processor:
-            self.file_processor.stop_processing()  # 使用新的停止方法
+            self.file_processor.stop_processing()
             self.logger.log("⚠️ 正在停止处理...\n")
-            self.start_button.config(state=tk.NORMAL)
             self.stop_button.config(state=tk.DISABLED)
         
     def on_closing(self):
         if self.file_processor and self.file_processor.processing_thread and self.file_processor.processing_thread.is_alive():
-            self.file_processor.stop_flag = True
+            self.file_processor.stop_processing()
             self.file_processor.processing_thread.join(timeout=1.0)
         self.config.save_config()  # 退出前保存配置
         self.root.destroy()
@@ -757,7 +3406,142 @@ class GUI:
     def run(self):
         self.root.mainloop()
 
-def main():
+# 命令行退出码
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_CANCELLED = 130
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="批量将漫画图片转换为 PDF 或长图（无图形界面模式，进度以 JSON Lines 输出到标准输出）")
+    parser.add_argument('-i', '--input', required=True, help="输入目录（包含各部漫画的文件夹）")
+    parser.add_argument('-o', '--output', required=True, help="输出目录")
+    parser.add_argument('-f', '--format', dest='formats', action='append', choices=('pdf', 'long'),
+                        help="生成的格式，可重复指定；默认只生成 PDF")
+    parser.add_argument('-j', '--workers', type=int, help="并行处理的章节数")
+    parser.add_argument('--backend', choices=('thread', 'process'), help="线程池或进程池")
+    parser.add_argument('--prefetch-mb', type=int, help="每个章节预读页面数据的上限（MB），0 表示不预读")
+    parser.add_argument('--memory-budget-mb', type=int,
+                        help="同时处理的章节估算内存之和的上限（MB），0 表示只按并行数限制")
+    parser.add_argument('--config', help="读取该配置文件作为默认值（不会写回）")
+    parser.add_argument('--image-quality', type=int, help="PDF 中需要重新编码的图片质量 1-100")
+    parser.add_argument('--pdf-max-width', type=int, help="PDF 页面的最大像素宽度，超过时缩小，0 表示不限制")
+    parser.add_argument('--pdf-max-height', type=int, help="PDF 页面的最大像素高度（例如阅读器屏幕高度），0 表示不限制")
+    parser.add_argument('--no-grayscale-detection', action='store_true', help="不检测灰度/黑白页面")
+    parser.add_argument('--grayscale-tolerance', type=int, help="灰度检测的颜色容差 0-255")
+    parser.add_argument('--volume-size', type=int,
+                        help="每 N 个章节 PDF 合并为一个带书签的合订本（直接复制图像，不重新编码），0 表示不生成")
+    parser.add_argument('--no-page-dedup', action='store_true', help="不合并 PDF 中内容相同的页面")
+    parser.add_argument('--near-duplicates', choices=('off', 'report', 'skip'),
+                        help="近似重复页（感知哈希）：off 不检测，report 只记录，skip 不写入 PDF")
+    parser.add_argument('--near-duplicate-distance', type=int, help="感知哈希差异不超过该位数（0-128）时视为近似重复")
+    parser.add_argument('--long-image-format', choices=tuple(LongImageWriter.FORMAT_EXTENSIONS), help="长图格式")
+    parser.add_argument('--long-image-max-height', type=int, help="单个长图文件的最大高度，0 表示不限制")
+    parser.add_argument('--archive-compression', choices=tuple(ZipArchiveWriter.COMPRESSIONS),
+                        help="输出 ZIP 的压缩方式，默认 stored（不压缩）；压缩不了的文件会自动改为直接存储")
+    parser.add_argument('--archive-level', type=int, help="ZIP 压缩级别 0-9（bzip2 为 1-9）")
+    parser.add_argument('--archive-workers', type=int, help="并行压缩 ZIP 条目的线程数")
+    parser.add_argument('--no-index', action='store_true', help="不使用缓存的目录索引，重新扫描输入目录")
+    parser.add_argument('--trace', action='store_true', help="记录各阶段耗时，输出汇总表并在输出目录保存 Chrome 跟踪文件")
+    parser.add_argument('--watch', action='store_true',
+                        help="处理完成后继续监视输入目录，自动处理新增或修改的漫画，按 Ctrl+C 结束")
+    parser.add_argument('--watch-settle', type=int, help="监视模式：漫画最后一次变化后静置多少秒才开始处理")
+    return parser
+
+# 无图形界面的批处理入口，返回退出码：0 全部成功，1 有章节失败或出现错误，2 参数错误，130 被中断
+def run_cli(argv):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.input):
+        parser.error(f"输入目录不存在：{args.input}")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers 必须大于 0")
+    if args.prefetch_mb is not None and args.prefetch_mb < 0:
+        parser.error("--prefetch-mb 不能为负数")
+    if args.memory_budget_mb is not None and args.memory_budget_mb < 0:
+        parser.error("--memory-budget-mb 不能为负数")
+    if args.volume_size is not None and args.volume_size < 0:
+        parser.error("--volume-size 不能为负数")
+    if args.archive_level is not None and not 0 <= args.archive_level <= 9:
+        parser.error("--archive-level 必须在 0-9 之间")
+    if args.archive_workers is not None and args.archive_workers < 1:
+        parser.error("--archive-workers 至少为 1")
+    if args.watch_settle is not None and args.watch_settle < 0:
+        parser.error("--watch-settle 不能为负数")
+
+    values = Config(args.config).config if args.config else Config.DEFAULT_CONFIG
+    config = Config.from_values(values)
+    overrides = {
+        'max_workers': args.workers,
+        'executor_backend': args.backend,
+        'prefetch_mb': args.prefetch_mb,
+        'memory_budget_mb': args.memory_budget_mb,
+        'image_quality': args.image_quality,
+        'pdf_max_width': args.pdf_max_width,
+        'pdf_max_height': args.pdf_max_height,
+        'pdf_grayscale_tolerance': args.grayscale_tolerance,
+        'pdf_near_duplicates': args.near_duplicates,
+        'pdf_volume_size': args.volume_size,
+        'pdf_near_duplicate_distance': args.near_duplicate_distance,
+        'long_image_format': args.long_image_format,
+        'long_image_max_height': args.long_image_max_height,
+        'archive_compression': args.archive_compression,
+        'archive_compress_level': args.archive_level,
+        'archive_workers': args.archive_workers,
+        'watch_settle_seconds': args.watch_settle,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            config.config[key] = value
+    if args.no_grayscale_detection:
+        config.config['pdf_grayscale_detection'] = False
+    if args.no_page_dedup:
+        config.config['pdf_deduplicate_pages'] = False
+    if args.no_index:
+        config.config['use_library_index'] = False
+    if args.trace:
+        config.config['trace_stages'] = True
+    formats = set(args.formats or ['pdf'])
+
+    logger = JsonLinesLogger()
+    processor = FileProcessor(config, logger, progress_callback=logger.progress)
+    result = {}
+    finished = threading.Event()
+
+    run = processor.watch_folders if args.watch else processor.process_folders
+
+    def process():
+        try:
+            result.update(run(args.input, args.output, 'pdf' in formats, 'long' in formats))
+        finally:
+            finished.set()
+
+    # 在后台线程中处理，主线程等待期间可以响应 Ctrl+C 并走正常的取消流程
+    threading.Thread(target=process, daemon=True).start()
+    try:
+        while not finished.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        logger.log("⚠️ 收到中断信号，正在停止处理...\n")
+        processor.stop_processing()
+        finished.wait()
+
+    logger.emit('done', **result)
+    if result.get('cancelled'):
+        return EXIT_CANCELLED
+    if not result or result['error'] or result['failed']:
+        return EXIT_FAILED
+    return EXIT_OK
+
+def main(argv=None):
+    # 打包为 exe 后使用进程池时需要
+    multiprocessing.freeze_support()
+    argv = sys.argv[1:] if argv is None else argv
+    # 带参数启动时以命令行模式运行，不导入 tkinter
+    if argv:
+        sys.exit(run_cli(argv))
+    load_tkinter()
     # 创建并运行GUI
     app = GUI()
     app.run()
@@ -0,0 +1,399 @@
+"""漫画转换性能基准测试
+
+long-image：生成合成的条漫章节，分别在独立子进程中运行旧版整张画布实现与当前的流式实现，
+对比峰值内存（RSS）与耗时。
+
+library：按 输入目录/漫画/章节/图片 的结构生成合成漫画库（页数、分辨率、JPEG/PNG/WebP 比例、
+灰度章节比例均可配置，相同参数与种子生成的库完全一致），在独立子进程中以无界面方式运行
+process_folders，分别测量 PDF、长图以及两者同时输出时的页/秒、MB/秒、峰值内存和各阶段耗时，
+结果保存为 JSON，便于在不同提交之间对比。
+
+compare：对比两次 library 基准测试保存的 JSON 结果。
+
+用法：
+    python benchmark.py long-image --pages 80 --width 1500 --height 2400
+    python benchmark.py library --comics 4 --chapters 6 --pages 20 --json results.json
+    python benchmark.py compare before.json after.json
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows 下没有 resource 模块，不统计峰值内存
+    resource = None
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Comic-to-PDF.py")
+
+
+# 主程序文件名包含连字符，无法直接 import。在临时目录中生成同名的包装模块 comic_to_pdf 并加入 sys.path，
+# 这样进程池的工作进程也能按模块名导入任务函数
+def load_converter():
+    shim_dir = os.path.join(tempfile.gettempdir(), f"comic-bench-shim-{os.getuid() if hasattr(os, 'getuid') else 0}")
+    os.makedirs(shim_dir, exist_ok=True)
+    with open(os.path.join(shim_dir, "comic_to_pdf.py"), "w", encoding="utf-8") as f:
+        f.write(f"with open({SCRIPT_PATH!r}, encoding='utf-8') as _f:\n"
+                f"    exec(compile(_f.read(), {SCRIPT_PATH!r}, 'exec'))\n")
+    if shim_dir not in sys.path:
+        sys.path.insert(0, shim_dir)
+    importlib.invalidate_caches()
+    return importlib.import_module("comic_to_pdf")
+
+
+class NullLogger:
+    """丢弃所有输出的日志记录器"""
+    def log(self, message):
+        pass
+
+
+# 当前进程的峰值内存（MB）
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# 生成一张带噪点的合成漫画页，避免纯色图片被压缩得过小而失真
+def make_page(width, height, seed, grayscale=False):
+    noise = Image.effect_noise((width, height), 48)
+    if grayscale:
+        return noise
+    tint = Image.new("RGB", (width, height), (seed * 37 % 256, seed * 91 % 256, seed * 53 % 256))
+    return Image.blend(noise.convert("RGB"), tint, 0.35)
+
+
+# 生成条漫章节：宽度交替变化以覆盖缩放路径
+def generate_webtoon_chapter(folder, pages, width, height):
+    os.makedirs(folder, exist_ok=True)
+    for index in range(pages):
+        page_width = width if index % 2 == 0 else int(width * 0.8)
+        make_page(page_width, height, index).save(os.path.join(folder, f"{index + 1:03d}.jpg"), quality=85)
+
+
+# 旧版实现：先分配整张长图画布，再逐张粘贴，每张图片打开两次
+def legacy_long_image(image_files, output_long_image):
+    images_info = []
+    max_width = 0
+    total_height = 0
+    for img_path in image_files:
+        with Image.open(img_path) as img:
+            width, height = img.size
+            max_width = max(max_width, width)
+            total_height += height
+            images_info.append((img_path, width, height))
+
+    long_image = Image.new('RGB', (max_width, total_height))
+    y_offset = 0
+    for img_path, width, height in images_info:
+        with Image.open(img_path) as img:
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            if width != max_width:
+                new_height = int(height * max_width / width)
+                img = img.resize((max_width, new_height), Image.LANCZOS)
+                height = new_height
+            long_image.paste(img, (0, y_offset))
+            y_offset += height
+    long_image.save(output_long_image, format='PNG', optimize=True)
+
+
+def run_long_image(implementation, chapter_folder, output_path, results):
+    converter = load_converter()
+    config = converter.Config.from_values(converter.Config.DEFAULT_CONFIG)
+    processor = converter.FileProcessor(config, NullLogger())
+    image_files = processor.get_images_in_folder(chapter_folder)
+
+    start = time.perf_counter()
+    if implementation == "legacy":
+        legacy_long_image(image_files, output_path)
+    else:
+        # 默认 PNG 格式且不分段时，输出文件为 output_base + ".png"
+        processor.create_long_image_from_images(image_files, os.path.splitext(output_path)[0])
+    elapsed = time.perf_counter() - start
+
+    results.put({
+        "implementation": implementation,
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "output_mb": round(os.path.getsize(output_path) / (1024 * 1024), 2),
+    })
+
+
+# 每个实现在全新的子进程中运行，保证峰值内存互不影响
+def run_isolated(target, *args):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=target, args=args + (results,))
+    process.start()
+    # 子进程异常退出时不会写入结果，避免一直等待
+    while True:
+        try:
+            result = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"基准测试子进程异常退出，退出码 {process.exitcode}")
+    process.join()
+    return result
+
+
+def benchmark_long_image(args):
+    work_dir = tempfile.mkdtemp(prefix="comic-bench-")
+    try:
+        chapter_folder = os.path.join(work_dir, "chapter")
+        generate_webtoon_chapter(chapter_folder, args.pages, args.width, args.height)
+        print(f"章节：{args.pages} 页，{args.width}x{args.height}")
+        for implementation in ("legacy", "streaming"):
+            output_path = os.path.join(work_dir, f"{implementation}_long.png")
+            result = run_isolated(run_long_image, implementation, chapter_folder, output_path)
+            peak = result["peak_rss_mb"]
+            peak_text = f"{peak:.0f} MB" if peak is not None else "N/A"
+            print(f"{implementation:>10}: {result['seconds']:.2f} s，峰值内存 {peak_text}，"
+                  f"输出 {result['output_mb']} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+IMAGE_FORMATS = {"jpeg": "jpg", "png": "png", "webp": "webp"}
+
+
+# 生成合成漫画库：输入目录/漫画/章节/图片，每页的格式按比例随机选择，部分章节为灰度
+def generate_library(root, comics, chapters, pages, width, height, format_weights, grayscale_ratio, seed):
+    rng = random.Random(seed)
+    formats = list(format_weights)
+    weights = [format_weights[name] for name in formats]
+    total_pages = 0
+    total_bytes = 0
+    for comic_index in range(comics):
+        for chapter_index in range(chapters):
+            folder = os.path.join(root, f"comic{comic_index + 1:02d}", f"chapter{chapter_index + 1:03d}")
+            os.makedirs(folder, exist_ok=True)
+            grayscale = rng.random() < grayscale_ratio
+            for page_index in range(pages):
+                image_format = rng.choices(formats, weights)[0]
+                page_width = width if rng.random() < 0.8 else int(width * 0.8)
+                page = make_page(page_width, height, rng.randrange(256), grayscale=grayscale)
+                path = os.path.join(folder, f"{page_index + 1:03d}.{IMAGE_FORMATS[image_format]}")
+                if image_format == "jpeg":
+                    page.save(path, quality=85)
+                elif image_format == "webp":
+                    page.save(path, quality=80)
+                else:
+                    page.save(path, compress_level=1)
+                total_pages += 1
+                total_bytes += os.path.getsize(path)
+    return total_pages, total_bytes
+
+
+# 按阶段汇总处理器记录的耗时（秒），是各线程/进程耗时之和
+def stage_totals(events):
+    totals = {}
+    for event in events:
+        totals[event["name"]] = totals.get(event["name"], 0.0) + event["dur"] / 1_000_000
+    return totals
+
+
+# 目录下所有文件的总大小
+def folder_size(folder):
+    total = 0
+    for root, _, files in os.walk(folder):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def run_library(mode, input_folder, output_folder, config_values, results):
+    converter = load_converter()
+    config = converter.Config.from_values(config_values)
+    processor = converter.FileProcessor(config, NullLogger())
+
+    start = time.perf_counter()
+    summary = processor.process_folders(input_folder, output_folder, mode in ("pdf", "both"), mode in ("long", "both"))
+    elapsed = time.perf_counter() - start
+
+    children_peak = None
+    if resource is not None:
+        children_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        children_peak = children_peak / (1024 * 1024) if sys.platform == "darwin" else children_peak / 1024
+    results.put({
+        "seconds": elapsed,
+        "summary": summary,
+        "stage_seconds": stage_totals(processor.tracer.events),
+        "peak_rss_mb": peak_rss_mb(),
+        "children_peak_rss_mb": children_peak,
+        "output_bytes": folder_size(output_folder),
+    })
+
+
+# 当前代码的提交号，便于对比不同提交的结果
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(SCRIPT_PATH),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_format_weights(text):
+    weights = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in IMAGE_FORMATS:
+            raise argparse.ArgumentTypeError(f"未知图片格式：{name}")
+        weights[name] = float(weight) if weight else 1.0
+    return weights
+
+
+def benchmark_library(args):
+    work_dir = tempfile.mkdtemp(prefix="comic-bench-")
+    try:
+        input_folder = os.path.join(work_dir, "input")
+        total_pages, total_bytes = generate_library(
+            input_folder, args.comics, args.chapters, args.pages, args.width, args.height,
+            args.formats, args.grayscale, args.seed)
+        input_mb = total_bytes / (1024 * 1024)
+        print(f"漫画库：{args.comics} 部 × {args.chapters} 章 × {args.pages} 页，"
+              f"{args.width}x{args.height}，共 {total_pages} 页 / {input_mb:.1f} MB")
+
+        converter = load_converter()
+        config_values = dict(converter.Config.DEFAULT_CONFIG)
+        config_values.update({
+            "max_workers": args.workers,
+            "executor_backend": args.backend,
+            "long_image_format": args.long_image_format,
+            # 由处理器自身记录各阶段耗时
+            "trace_stages": True,
+        })
+
+        runs = []
+        for mode in args.modes:
+            for repeat in range(args.repeat):
+                output_folder = os.path.join(work_dir, f"output-{mode}-{repeat}")
+                result = run_isolated(run_library, mode, input_folder, output_folder, config_values)
+                shutil.rmtree(output_folder, ignore_errors=True)
+                seconds = result["seconds"]
+                run = {
+                    "mode": mode,
+                    "repeat": repeat,
+                    "seconds": round(seconds, 3),
+                    "pages_per_second": round(total_pages / seconds, 2),
+                    "input_mb_per_second": round(input_mb / seconds, 2),
+                    "output_mb": round(result["output_bytes"] / (1024 * 1024), 2),
+                    "peak_rss_mb": result["peak_rss_mb"],
+                    "children_peak_rss_mb": result["children_peak_rss_mb"],
+                    "stage_seconds": {stage: round(value, 3) for stage, value in result["stage_seconds"].items()},
+                    "failed": result["summary"]["failed"],
+                    "error": result["summary"]["error"],
+                }
+                runs.append(run)
+                peak = run["peak_rss_mb"]
+                peak_text = f"{peak:.0f} MB" if peak is not None else "N/A"
+                stages = ", ".join(f"{stage} {value:.2f} s" for stage, value in run["stage_seconds"].items())
+                print(f"{mode:>5} #{repeat + 1}: {seconds:.2f} s，{run['pages_per_second']:.1f} 页/秒，"
+                      f"{run['input_mb_per_second']:.1f} MB/秒，峰值内存 {peak_text}" + (f"，{stages}" if stages else ""))
+
+        report = {
+            "benchmark": "library",
+            "revision": git_revision(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": {
+                "comics": args.comics, "chapters": args.chapters, "pages": args.pages,
+                "width": args.width, "height": args.height, "formats": args.formats,
+                "grayscale": args.grayscale, "seed": args.seed, "workers": args.workers,
+                "backend": args.backend, "long_image_format": args.long_image_format,
+            },
+            "input": {"pages": total_pages, "mb": round(input_mb, 2)},
+            "runs": runs,
+        }
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"结果已保存：{args.json}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# 按模式取多次运行中耗时最短的一次
+def best_runs(report):
+    best = {}
+    for run in report["runs"]:
+        if run["mode"] not in best or run["seconds"] < best[run["mode"]]["seconds"]:
+            best[run["mode"]] = run
+    return best
+
+
+def benchmark_compare(args):
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    if before["parameters"] != after["parameters"]:
+        print("⚠️ 两次测试的参数不同，结果仅供参考")
+    print(f"{before.get('revision')} → {after.get('revision')}")
+    before_runs = best_runs(before)
+    for mode, run in best_runs(after).items():
+        if mode not in before_runs:
+            continue
+        old = before_runs[mode]
+        print(f"{mode:>5}: {old['seconds']:.2f} s → {run['seconds']:.2f} s "
+              f"({old['seconds'] / run['seconds']:.2f}x)，页/秒 {old['pages_per_second']} → {run['pages_per_second']}，"
+              f"峰值内存 {old['peak_rss_mb']} → {run['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comic-to-PDF 性能基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    long_parser = subparsers.add_parser("long-image", help="对比长图生成的耗时与峰值内存")
+    long_parser.add_argument("--pages", type=int, default=80, help="章节页数")
+    long_parser.add_argument("--width", type=int, default=1500, help="页面宽度（像素）")
+    long_parser.add_argument("--height", type=int, default=2400, help="页面高度（像素）")
+    long_parser.set_defaults(func=benchmark_long_image)
+
+    library_parser = subparsers.add_parser("library", help="在合成漫画库上测量完整处理流程的吞吐量")
+    library_parser.add_argument("--comics", type=int, default=3, help="漫画数量")
+    library_parser.add_argument("--chapters", type=int, default=4, help="每部漫画的章节数")
+    library_parser.add_argument("--pages", type=int, default=20, help="每章页数")
+    library_parser.add_argument("--width", type=int, default=1200, help="页面宽度（像素）")
+    library_parser.add_argument("--height", type=int, default=1800, help="页面高度（像素）")
+    library_parser.add_argument("--formats", type=parse_format_weights, default="jpeg=6,png=2,webp=2",
+                                help="图片格式及权重，例如 jpeg=6,png=2,webp=2")
+    library_parser.add_argument("--grayscale", type=float, default=0.3, help="灰度章节所占比例 0-1")
+    library_parser.add_argument("--seed", type=int, default=1, help="随机种子，相同参数生成相同的漫画库")
+    library_parser.add_argument("--modes", nargs="+", choices=("pdf", "long", "both"), default=["pdf", "long", "both"],
+                                help="测试的输出模式")
+    library_parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="并行章节数")
+    library_parser.add_argument("--backend", choices=("thread", "process"), default="thread", help="线程池或进程池")
+    library_parser.add_argument("--long-image-format", default="png", help="长图格式")
+    library_parser.add_argument("--repeat", type=int, default=1, help="每种模式重复运行的次数")
+    library_parser.add_argument("--json", help="保存结果的 JSON 文件路径")
+    library_parser.set_defaults(func=benchmark_library)
+
+    compare_parser = subparsers.add_parser("compare", help="对比两次 library 测试的 JSON 结果")
+    compare_parser.add_argument("before", help="基准结果")
+    compare_parser.add_argument("after", help="新的结果")
+    compare_parser.set_defaults(func=benchmark_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Comic-to-PDF.py')
+
+
+# 脚本文件名带连字符，无法直接 import，按路径加载为模块
+def load_script():
+    spec = importlib.util.spec_from_file_location('comic_to_pdf', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['comic_to_pdf'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope='session')
+def c2p():
+    return load_script()
+
+
+# 创建使用默认配置（可覆盖部分选项）、不读写配置文件的 FileProcessor
+@pytest.fixture
+def make_processor(c2p):
+    def make(**overrides):
+        config = c2p.Config.from_values(dict(c2p.Config.DEFAULT_CONFIG, **overrides))
+        return c2p.FileProcessor(config, c2p.BufferedLogger())
+    return make
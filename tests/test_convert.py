@@ -0,0 +1,34 @@
+import os
+
+import pytest
+from PIL import Image
+
+
+def make_library(tmp_path):
+    good = tmp_path / 'lib' / 'Good' / 'ch1'
+    bad = tmp_path / 'lib' / 'Bad' / 'broken'
+    good.mkdir(parents=True)
+    bad.mkdir(parents=True)
+    for number in range(2):
+        Image.new('RGB', (60, 80), 'white').save(good / f'{number:02d}.jpg')
+        (bad / f'{number:02d}.jpg').write_bytes(b'not an image')
+    return str(tmp_path / 'lib'), str(tmp_path / 'out')
+
+
+# 章节全部失败的漫画不打包空文件夹，也不报告全部完成；进程池中章节标题排在该章节的日志之前
+@pytest.mark.parametrize('backend', ['thread', 'process'])
+def test_failed_chapter_is_not_archived(tmp_path, c2p, backend):
+    base, output = make_library(tmp_path)
+    config = c2p.Config.from_values(dict(c2p.Config.DEFAULT_CONFIG, executor_backend=backend, max_workers=2))
+    logger = c2p.BufferedLogger()
+
+    summary = c2p.FileProcessor(config, logger).process_folders(base, output, True, False)
+    log = logger.getvalue()
+
+    assert summary['failed'] == 1
+    assert os.path.exists(os.path.join(output, 'Good_pdf.zip'))
+    assert not os.path.exists(os.path.join(output, 'Bad_pdf.zip'))
+    assert '🎉' not in log
+    if backend == 'process':
+        saved = log.index(f"✅ PDF 已保存：{os.path.join(output, 'Good_pdf', 'ch1.pdf')}")
+        assert '📂 处理章节：ch1' in log[:saved]
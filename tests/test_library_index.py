@@ -0,0 +1,59 @@
+import os
+
+from PIL import Image
+
+
+def make_library(tmp_path):
+    chapter = tmp_path / 'lib' / 'Comic' / 'ch1'
+    chapter.mkdir(parents=True)
+    Image.new('RGB', (300, 400), 'white').save(chapter / '01.png')
+    (tmp_path / 'out').mkdir()
+    return str(tmp_path / 'lib'), str(tmp_path / 'out'), chapter
+
+
+def rescan(c2p, base, output):
+    index = c2p.LibraryIndex(output)
+    index.scan(base)
+    index.save()
+    return index
+
+
+# 原地覆盖图片不会改变目录的修改时间，复用目录列表时仍要发现页面的变化并重新读取文件头
+def test_rescan_detects_page_overwritten_in_place(tmp_path, c2p):
+    base, output, chapter = make_library(tmp_path)
+    rescan(c2p, base, output)
+    directory_stat = os.stat(chapter)
+
+    page = chapter / '01.png'
+    Image.new('RGB', (300, 600), 'white').save(page)
+    os.utime(page, ns=(directory_stat.st_atime_ns, directory_stat.st_mtime_ns + 10 ** 9))
+    os.utime(chapter, ns=(directory_stat.st_atime_ns, directory_stat.st_mtime_ns))
+
+    index = rescan(c2p, base, output)
+    assert index.scanned == 0
+    name, size, mtime, width, height, _ = index.pages(str(chapter))[0]
+    assert (name, width, height) == ('01.png', 300, 600)
+    assert (size, mtime) == (os.path.getsize(page), os.stat(page).st_mtime_ns)
+
+
+def test_rescan_reuses_unchanged_pages(tmp_path, c2p, monkeypatch):
+    base, output, chapter = make_library(tmp_path)
+    rescan(c2p, base, output)
+
+    # 未变化的页面不再读取文件头
+    monkeypatch.setattr(c2p, 'probe_image', lambda page: [0, 0, None])
+    index = rescan(c2p, base, output)
+    assert index.pages(str(chapter))[0][3:] == [300, 400, 'RGB']
+
+
+# 监视模式下已知发生变化的漫画整棵重新扫描，不复用上次的记录
+def test_rescan_listed_comics(tmp_path, c2p):
+    base, output, chapter = make_library(tmp_path)
+    (tmp_path / 'lib' / 'Other').mkdir()
+    rescan(c2p, base, output)
+
+    index = c2p.LibraryIndex(output)
+    index.scan(base, rescan=['Comic'])
+    assert index.scanned == 2
+    assert index.reused == 2
+    assert index.pages(str(chapter))[0][3:] == [300, 400, 'RGB']
@@ -0,0 +1,42 @@
+import os
+
+from PIL import Image
+
+
+def make_pages(tmp_path, count=3):
+    pages = []
+    for number in range(count):
+        path = tmp_path / f'{number:02d}.png'
+        Image.new('RGB', (100, 150), (number * 60, 0, 0)).save(path)
+        pages.append(str(path))
+    return pages
+
+
+# 取消重新生成章节时，上次生成的长图保留不变
+def test_cancelled_rebuild_keeps_previous_long_image(tmp_path, make_processor):
+    chapter = tmp_path / 'ch'
+    chapter.mkdir()
+    make_pages(chapter)
+    long_folder = tmp_path / 'out'
+    long_folder.mkdir()
+    chapter_info = (str(chapter), None, str(long_folder), False, True, None)
+    assert make_processor().process_single_chapter(chapter_info)['built'] == ['long']
+    (long_image,) = os.listdir(long_folder)
+    previous = (long_folder / long_image).read_bytes()
+
+    processor = make_processor()
+    processor.stop_processing()
+    assert processor.process_single_chapter(chapter_info)['built'] == []
+    assert os.listdir(long_folder) == [long_image]
+    assert (long_folder / long_image).read_bytes() == previous
+
+
+# 新长图写入后才删除过期的文件：改为分段后，原来不分段的长图被删除
+def test_rebuild_removes_stale_long_image_files(tmp_path, make_processor):
+    pages = make_pages(tmp_path)
+    output_base = str(tmp_path / 'out' / 'ch_long')
+    os.makedirs(os.path.dirname(output_base))
+    assert make_processor().create_long_image_from_images(pages, output_base)
+
+    assert make_processor(long_image_max_height=200).create_long_image_from_images(pages, output_base)
+    assert sorted(os.listdir(os.path.dirname(output_base))) == ['ch_long_001.png', 'ch_long_002.png', 'ch_long_003.png']
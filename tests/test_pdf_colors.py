@@ -0,0 +1,55 @@
+import pytest
+from PIL import Image, ImageDraw
+
+
+# 大片浅灰（215）底色加一块深灰（40），外加少量黑色线条
+def wash_page():
+    img = Image.new('L', (400, 600), 255)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 399, 359), fill=215)
+    draw.rectangle((0, 360, 399, 479), fill=40)
+    for y in range(20, 600, 40):
+        draw.line((20, y, 380, y), fill=0, width=2)
+    return img
+
+
+def line_art_page():
+    img = Image.new('L', (400, 600), 255)
+    draw = ImageDraw.Draw(img)
+    for y in range(40, 600, 80):
+        draw.line((20, y, 380, y), fill=0, width=4)
+    return img
+
+
+# 浅灰、深灰大面积填充的灰度页面不能被当作黑白线稿压成 1 位
+@pytest.mark.parametrize('extension', ['jpg', 'png'])
+def test_gray_wash_is_not_bilevel(tmp_path, make_processor, extension):
+    path = tmp_path / f'wash.{extension}'
+    wash_page().save(path)
+
+    _, _, _, color_space, _, _, bits = make_processor().load_pdf_page(str(path))
+    assert (color_space, bits) == ('DeviceGray', 8)
+
+
+@pytest.mark.parametrize('extension', ['jpg', 'png'])
+def test_line_art_is_bilevel(tmp_path, make_processor, extension):
+    path = tmp_path / f'lines.{extension}'
+    line_art_page().save(path)
+
+    _, _, _, color_space, _, _, bits = make_processor().load_pdf_page(str(path))
+    assert (color_space, bits) == ('DeviceGray', 1)
+
+
+# 同时生成 PDF 与长图并开启灰度检测时，每页 JPEG 仍只解码一次，颜色判断复用长图的解码结果
+def test_color_detection_reuses_long_image_decode(tmp_path, make_processor):
+    pages = []
+    for number, page in enumerate([wash_page(), line_art_page()] * 2 + [wash_page().convert('RGB')]):
+        path = tmp_path / f'{number:02d}.jpg'
+        page.save(path)
+        pages.append(str(path))
+
+    processor = make_processor(trace_stages=True)
+    built = processor.create_outputs_from_images(pages, str(tmp_path / 'ch.pdf'), str(tmp_path / 'ch_long'))
+    assert built == ['pdf', 'long']
+    decodes = [event for event in processor.tracer.take_events() if event['name'] == 'decode']
+    assert len(decodes) == len(pages)
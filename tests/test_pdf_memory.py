@@ -0,0 +1,60 @@
+import os
+import struct
+import subprocess
+import sys
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from conftest import SCRIPT
+
+# 子进程通过 resource 模块读取峰值内存，Windows 上没有该模块
+pytest.importorskip('resource')
+
+PAGES = 1000
+# 1000 页 JPEG 共约 260 MB；逐页写出时峰值只与单页大小有关，整章读入内存则远超此上限
+MAX_RSS_MB = 150
+
+CHILD = """
+import importlib.util, os, resource, sys
+spec = importlib.util.spec_from_file_location('comic_to_pdf', sys.argv[1])
+c2p = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(c2p)
+processor = c2p.FileProcessor(c2p.Config.from_values(c2p.Config.DEFAULT_CONFIG), c2p.BufferedLogger())
+pages = [os.path.join(sys.argv[2], name) for name in sorted(os.listdir(sys.argv[2]))]
+if not processor.create_pdf_from_images(pages, sys.argv[3]):
+    sys.exit(1)
+# 只报告本进程的峰值，不受测试进程其他子进程的影响
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+# 噪点 JPEG 无法被压缩；每页插入不同的注释段，内容各不相同，不会被当作重复页共享
+def make_pages(folder):
+    buffer = BytesIO()
+    Image.effect_noise((500, 750), 64).convert('RGB').save(buffer, format='JPEG', quality=90)
+    data = buffer.getvalue()
+    for number in range(PAGES):
+        comment = f'page {number}'.encode()
+        segment = b'\xff\xfe' + struct.pack('>H', len(comment) + 2) + comment
+        (folder / f'{number:04d}.jpg').write_bytes(data[:2] + segment + data[2:])
+    return len(data) * PAGES
+
+
+# 在单独的子进程中生成 1000 页的 PDF，由子进程报告自身的峰值常驻内存，不应随章节大小增长
+def test_pdf_peak_rss_on_large_chapter(tmp_path):
+    pages = tmp_path / 'pages'
+    pages.mkdir()
+    total_bytes = make_pages(pages)
+    output_pdf = tmp_path / 'chapter.pdf'
+
+    child = subprocess.run([sys.executable, '-c', CHILD, SCRIPT, str(pages), str(output_pdf)],
+                           check=True, capture_output=True, text=True)
+
+    max_rss = int(child.stdout.split()[-1])
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    max_rss_mb = max_rss / (1048576 if sys.platform == 'darwin' else 1024)
+    assert os.path.getsize(output_pdf) > total_bytes
+    assert total_bytes > MAX_RSS_MB * 1048576
+    assert max_rss_mb < MAX_RSS_MB
@@ -0,0 +1,43 @@
+import pytest
+from PIL import Image
+
+
+def gradient(mode):
+    img = Image.linear_gradient('L').resize((300, 400))
+    if mode == '1':
+        return img.convert('1')
+    if mode == 'P':
+        return img.convert('RGB').convert('P', palette=Image.ADAPTIVE)
+    if mode == 'I;16':
+        return img.convert('I').point(lambda value: value * 256).convert('I;16')
+    return img.convert(mode)
+
+
+# 设置最大高度后，各种模式的 PNG 都应缩小后写入，而不是因 reduce() 不支持该模式被跳过
+@pytest.mark.parametrize('mode', ['1', 'L', 'LA', 'P', 'RGB', 'RGBA', 'I;16'])
+def test_scaled_page_for_each_mode(tmp_path, make_processor, mode):
+    path = tmp_path / 'page.png'
+    gradient(mode).save(path)
+    assert Image.open(path).mode == mode
+
+    processor = make_processor(pdf_max_height=100)
+    _, width, height, _, _, _, _ = processor.load_pdf_page(str(path))
+    assert (width, height) == (75, 100)
+
+
+def test_scaled_palette_page_with_transparency(tmp_path, make_processor):
+    path = tmp_path / 'page.png'
+    gradient('L').convert('P').save(path, transparency=0)
+
+    processor = make_processor(pdf_max_height=100)
+    _, width, height, _, _, _, _ = processor.load_pdf_page(str(path))
+    assert (width, height) == (75, 100)
+
+
+# 16 位灰度缩到 8 位时按比例换算，不能截断为全白
+def test_scaled_16bit_page_keeps_tones(make_processor):
+    processor = make_processor()
+    img = processor.scale_to(gradient('I;16'), (75, 100))
+    assert img.mode == 'L'
+    assert img.getextrema()[0] < 16
+    assert img.getextrema()[1] > 240
@@ -0,0 +1,60 @@
+import os
+
+from PIL import Image
+
+
+def make_outputs(tmp_path, chapters, volumes):
+    pdf_folder = tmp_path / 'Comic_pdf'
+    volume_folder = tmp_path / 'Comic_volumes'
+    pdf_folder.mkdir()
+    volume_folder.mkdir()
+    for number in range(1, chapters + 1):
+        (pdf_folder / f'ch{number}.pdf').write_bytes(b'%PDF-1.4\n')
+    for number in range(1, volumes + 1):
+        (volume_folder / f'Comic_{number:03d}.pdf').write_bytes(b'%PDF-1.4\n')
+    return str(tmp_path), volume_folder
+
+
+# 每卷章节数变大后，编号超出当前卷数的旧合订本及其清单记录被删除，只重新生成仍存在的卷
+def test_plan_volumes_removes_stale_volumes(tmp_path, c2p, make_processor):
+    output_folder, volume_folder = make_outputs(tmp_path, chapters=3, volumes=2)
+    manifest = c2p.BuildManifest(output_folder)
+    manifest.adopt_existing = False
+    stale_key = os.path.join('Comic_volumes', 'Comic_002.pdf')
+    manifest.record(stale_key, [], {})
+
+    volumes = make_processor(pdf_volume_size=5).plan_volumes('Comic', output_folder, manifest)
+
+    assert list(volumes) == [os.path.join('Comic_volumes', 'Comic_001.pdf')]
+    assert [source[0] for source in volumes[os.path.join('Comic_volumes', 'Comic_001.pdf')][1]] == \
+        ['ch1.pdf', 'ch2.pdf', 'ch3.pdf']
+    assert sorted(os.listdir(volume_folder)) == ['Comic_001.pdf']
+    assert stale_key not in manifest.entries
+    manifest.close()
+
+
+def test_plan_volumes_keeps_volumes_in_range(tmp_path, c2p, make_processor):
+    output_folder, volume_folder = make_outputs(tmp_path, chapters=3, volumes=2)
+    manifest = c2p.BuildManifest(output_folder)
+
+    make_processor(pdf_volume_size=2).plan_volumes('Comic', output_folder, manifest)
+
+    assert sorted(os.listdir(volume_folder)) == ['Comic_001.pdf', 'Comic_002.pdf']
+    manifest.close()
+
+
+# 页数很多的章节：/Pages 对象的 /Kids 数组超过一次读取的块大小时仍能完整读出
+def test_build_volume_from_large_chapter(tmp_path, c2p, make_processor):
+    pages = []
+    for number in range(600):
+        path = tmp_path / f'{number:03d}.jpg'
+        Image.new('RGB', (60, 80), (number % 256, 0, 0)).save(path)
+        pages.append(str(path))
+    processor = make_processor()
+    chapters = [str(tmp_path / 'ch1.pdf'), str(tmp_path / 'ch2.pdf')]
+    assert processor.create_pdf_from_images(pages, chapters[0])
+    assert processor.create_pdf_from_images(pages[:3], chapters[1])
+
+    volume_path = str(tmp_path / 'Comic_volumes' / 'Comic_001.pdf')
+    assert processor.build_volume(volume_path, chapters)
+    assert len(list(c2p.PdfImageReader(volume_path).pages())) == 603